@@ -1,2 +1,2 @@
 .\venv\Scripts\activate.ps1
-.\venv\Scripts\pyinstaller.exe --clean --windowed --onefile --name="Knowledge Base Constructor" --icon "./source/qtgui/resource/app.ico" main.py --exclude-module PySide2 --exclude-module PySide --exclude-module PyQt4
\ No newline at end of file
+.\venv\Scripts\pyinstaller.exe --clean --windowed --onefile --name="Knowledge Base Constructor" --icon "./source/qtgui/resource/app.ico" main.py --add-data "./source/qtgui/resource/application.rcc;source/qtgui/resource" --exclude-module PySide2 --exclude-module PySide --exclude-module PyQt4
\ No newline at end of file
@@ -0,0 +1,139 @@
+# *- coding: utf-8 -*-
+"""
+Нагрузочный тест сервиса опроса (source/service.py).
+Сначала открывает все сеансы, затем отвечает на вопросы вперемешку по всем сеансам сразу,
+так что одновременно живут все --sessions сеансов; запросы идут по --connections keep-alive соединениям.
+
+    python -m source.service &
+    python load_test.py --sessions 5000 --connections 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+
+class Client:
+    """Одно keep-alive соединение с сервисом."""
+
+    def __init__(self, host: str, port: int, latencies: List[float]):
+        self.host: str = host
+        self.port: int = port
+        self.latencies: List[float] = latencies
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method: str, path: str, payload: Optional[dict] = None) -> Tuple[int, dict]:
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        start = time.perf_counter()
+        self.writer.write(f'{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n'
+                          f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n'.encode('latin-1')
+                          + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        data = json.loads(await self.reader.readexactly(length)) if length else dict()
+        self.latencies.append(time.perf_counter() - start)
+        return status, data
+
+    def close(self):
+        self.writer.close()
+
+
+async def run(args) -> dict:
+    latencies: List[float] = list()
+    clients = [Client(args.host, args.port, latencies) for _ in range(args.connections)]
+    await asyncio.gather(*(c.connect() for c in clients))
+    status, data = await clients[0].request('GET', '/bases')
+    bases = [b['name'] for b in data['bases']]
+    if args.base:
+        bases = [args.base]
+    rnd = random.Random(args.seed)
+    errors = 0
+
+    # 1. все сеансы открыты
+    pending: Deque[str] = deque()
+    per_client = [args.sessions // args.connections + (i < args.sessions % args.connections)
+                  for i in range(args.connections)]
+
+    async def open_sessions(client: Client, count: int):
+        nonlocal errors
+        for _ in range(count):
+            status, data = await client.request('POST', '/sessions', {'base': rnd.choice(bases)})
+            if status == 201:
+                pending.append(data['session'])
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(open_sessions(c, n) for c, n in zip(clients, per_client)))
+    opened = time.perf_counter() - start
+
+    # 2. ответы по кругу: сеанс после ответа уходит в конец очереди, пока расчёт не завершён
+    finished = 0
+    answers = 0
+
+    async def answer_sessions(client: Client):
+        nonlocal errors, finished, answers
+        while pending:
+            session_id = pending.popleft()
+            status, data = await client.request('POST', f'/sessions/{session_id}/answer',
+                                                {'answer': rnd.randrange(5)})
+            answers += 1
+            if status != 200:
+                errors += 1
+                continue
+            # в режиме --stateless каждый ответ возвращает новый токен сеанса
+            session_id = data['session']
+            if data['stop']:
+                status, _ = await client.request('GET', f'/sessions/{session_id}/result')
+                await client.request('DELETE', f'/sessions/{session_id}')
+                finished += 1
+            else:
+                pending.append(session_id)
+
+    await asyncio.gather(*(answer_sessions(c) for c in clients))
+    elapsed = time.perf_counter() - start
+    for c in clients:
+        c.close()
+
+    latencies.sort()
+    return {
+        'sessions': args.sessions, 'connections': args.connections, 'finished': finished, 'errors': errors,
+        'answers': answers, 'requests': len(latencies),
+        'open_s': round(opened, 3), 'total_s': round(elapsed, 3),
+        'rps': round(len(latencies) / elapsed), 'answers_per_s': round(answers / (elapsed - opened)),
+        'p50_ms': round(latencies[len(latencies) // 2] * 1000, 2),
+        'p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 2),
+        'p99_ms': round(latencies[int(len(latencies) * 0.99)] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест сервиса опроса')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--sessions', type=int, default=2000, help='сеансов, живущих одновременно')
+    parser.add_argument('--connections', type=int, default=100)
+    parser.add_argument('--base', help='имя базы (по умолчанию - случайная из загруженных)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    for name, value in asyncio.run(run(args)).items():
+        print(f'{name:<14} {value}')
+
+
+if __name__ == '__main__':
+    main()
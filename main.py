@@ -1,33 +1,89 @@
 # *- coding: utf-8 -*-
 
+import time
+
+_START = time.perf_counter()
+
 import sys
+from pathlib import Path
 
+from PyQt5.QtCore import QEvent, QObject
 from PyQt5.QtWidgets import QApplication
-from PyQt5.QtGui import QIcon
 
-from source.check_clone import check_clone
+from source.single_instance import SingleInstance
 
 APP_NAME = "Knowledge Base Constructor"
 
 
+class StartupReport(QObject):
+    """
+    Замер запуска (--startup-report): время от начала main.py до каждого этапа и до первой отрисовки окна.
+    Подробный отчёт по импортам даёт python -X importtime main.py.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.stages = [('импорт PyQt5', time.perf_counter())]
+
+    def mark(self, stage: str):
+        self.stages.append((stage, time.perf_counter()))
+
+    def eventFilter(self, obj: QObject, event: QEvent) -> bool:
+        if event.type() == QEvent.Paint:
+            obj.removeEventFilter(self)
+            self.mark('первая отрисовка')
+            self.print()
+        return False
+
+    def print(self):
+        previous = _START
+        for stage, moment in self.stages:
+            print(f'{stage:<24} {(moment - previous) * 1000:8.1f} мс {(moment - _START) * 1000:8.1f} мс',
+                  file=sys.stderr)
+            previous = moment
+
+
 def main():
-    argv = sys.argv.copy()
+    report = StartupReport() if '--startup-report' in sys.argv else None
+    argv = [arg for arg in sys.argv if arg != '--startup-report']
+    # пути передаются работающему экземпляру, поэтому сразу абсолютные
+    paths = [str(Path(arg).resolve()) for arg in argv[1:] if not arg.startswith('-') and Path(arg).is_file()]
+    instance = SingleInstance(APP_NAME)
+    if not instance.acquire() and instance.forward(paths):
+        sys.exit(0)
     argv.append(APP_NAME)
-    argv.append("--platform")
-    argv.append("windows:dpiawareness=0")
+    if sys.platform == 'win32':
+        argv.append("--platform")
+        argv.append("windows:dpiawareness=0")
 
     application = QApplication(argv)
-    application.setWindowIcon(QIcon(":/icons/app.png"))
+    from source.resources import icon
+    application.setWindowIcon(icon('app.png'))
     application.setApplicationName(APP_NAME)
-    exit_code = check_clone()
-    if exit_code == 0:
-        from source.widgets import AppMainWindow
-        main_window = AppMainWindow()
-        main_window.show()
-        exit_code = application.exec()
-    else:
+    if report:
+        report.mark('QApplication')
+    if not instance.lock.isLocked() and not instance.acquire():
+        # блокировка занята, а экземпляр не отвечает
         from source.message import CriticalMessage
         CriticalMessage('Ошибка запуска', 'Приложение уже запущено!')
+        sys.exit(1)
+    # соединения принимаются только в цикле событий, когда окно уже подписано на paths_received
+    try:
+        instance.listen()
+    except OSError as error:
+        print(f'Открытие баз из других запусков недоступно: {error}', file=sys.stderr)
+    from source.widgets import AppMainWindow
+    if report:
+        report.mark('импорт source.widgets')
+    main_window = AppMainWindow()
+    if report:
+        report.mark('AppMainWindow')
+        main_window.installEventFilter(report)
+    instance.paths_received.connect(main_window.open_paths)
+    main_window.show()
+    main_window.open_paths(paths)
+    exit_code = application.exec()
+    instance.release()
     sys.exit(exit_code)
 
 
@@ -1,2 +1 @@
 # *- coding: utf-8 -*-
-import source.application_rc
@@ -0,0 +1,135 @@
+# *- coding: utf-8 -*-
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    from source.model import KnowledgeBase
+
+
+class _Item(NamedTuple):
+    kb: 'KnowledgeBase'
+    mtime: int
+    size: int
+
+
+class BaseCache:
+    """
+    Загруженные базы знаний по пути к файлу с вытеснением давно не использованных (LRU).
+    Занятые базы (открытые во вкладке или в сеансе расчёта) не вытесняются и не перечитываются;
+    свободные перечитываются, если файл изменился на диске.
+    Память оценивается по размеру файла, умноженному на SIZE_FACTOR.
+    """
+
+    # во сколько раз объекты Python в памяти больше файла базы на диске (оценка)
+    SIZE_FACTOR = 8
+
+    def __init__(self, loader: Callable[[Path, bool], 'KnowledgeBase'], max_bytes: int = 256 * 2 ** 20):
+        self.loader = loader
+        self.max_bytes: int = max_bytes
+        self.items: 'OrderedDict[Path, _Item]' = OrderedDict()
+        self.pins: Dict[Path, int] = dict()
+        self.total: int = 0
+
+    def __iter__(self) -> Iterator['KnowledgeBase']:
+        return (item.kb for item in self.items.values())
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    @staticmethod
+    def key(path: Path) -> Path:
+        return path.resolve()
+
+    @staticmethod
+    def _stat(path: Path):
+        try:
+            stat = path.stat()
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return 0, 0
+
+    def get(self, path: Path, lazy: bool = False, pin: bool = False) -> 'KnowledgeBase':
+        key = self.key(path)
+        mtime, size = self._stat(key)
+        item = self.items.get(key)
+        if item is not None and (item.mtime != mtime and not self.pins.get(key)):
+            self._drop(key)
+            item = None
+        if item is None:
+            kb = self.loader(path, lazy)
+            item = _Item(kb, mtime, size * self.SIZE_FACTOR)
+            self.items[key] = item
+            self.total += item.size
+        self.items.move_to_end(key)
+        if pin:
+            self.pins[key] = self.pins.get(key, 0) + 1
+        self.evict()
+        return item.kb
+
+    def lookup(self, path: Path, pin: bool = False) -> Optional['KnowledgeBase']:
+        """Как get, но без чтения с диска: None, если базы нет в кэше или свободная база устарела."""
+        key = self.key(path)
+        item = self.items.get(key)
+        if item is None or item.mtime != self._stat(key)[0] and not self.pins.get(key):
+            return None
+        self.items.move_to_end(key)
+        if pin:
+            self.pins[key] = self.pins.get(key, 0) + 1
+        return item.kb
+
+    def put(self, kb: 'KnowledgeBase', pin: bool = False):
+        key = self.key(kb.last_path)
+        old = self.items.pop(key, None)
+        if old is not None:
+            self.total -= old.size
+            if old.kb is not kb and old.kb._storage is not None:
+                old.kb._storage.close()
+        mtime, size = self._stat(key)
+        self.items[key] = _Item(kb, mtime, size * self.SIZE_FACTOR)
+        self.total += size * self.SIZE_FACTOR
+        if pin:
+            self.pins[key] = self.pins.get(key, 0) + 1
+        self.evict()
+
+    def find(self, kb: 'KnowledgeBase') -> Optional[Path]:
+        for key, item in self.items.items():
+            if item.kb is kb:
+                return key
+        return None
+
+    def release(self, kb: 'KnowledgeBase'):
+        key = self.find(kb)
+        if key is None or key not in self.pins:
+            return
+        self.pins[key] -= 1
+        if self.pins[key] <= 0:
+            del self.pins[key]
+        self.evict()
+
+    def rekey(self, kb: 'KnowledgeBase', new_path: Path):
+        """Переносит запись базы на новый путь после переименования файла."""
+        old_key = self.find(kb)
+        if old_key is None:
+            return
+        item = self.items.pop(old_key)
+        new_key = self.key(new_path)
+        mtime, size = self._stat(new_key)
+        self.total += size * self.SIZE_FACTOR - item.size
+        self.items[new_key] = _Item(kb, mtime, size * self.SIZE_FACTOR)
+        if old_key in self.pins:
+            self.pins[new_key] = self.pins.pop(old_key)
+
+    def evict(self):
+        """Вытесняет свободные базы, начиная с давно не использованных; последняя использованная остаётся."""
+        for key in list(self.items)[:-1]:
+            if self.total <= self.max_bytes:
+                return
+            if not self.pins.get(key):
+                self._drop(key)
+
+    def _drop(self, key: Path):
+        item = self.items.pop(key)
+        self.total -= item.size
+        if item.kb._storage is not None:
+            item.kb._storage.close()
@@ -0,0 +1,52 @@
+# *- coding: utf-8 -*-
+import copy
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from source.model import CalculationProcess
+
+# Нет - 0   Скорее нет - 1  Не знаю - 2     Скорее да - 3   Да - 4
+ANSWERS = (0, 1, 2, 3, 4)
+
+
+def advance(calculator: CalculationProcess, answer: int) -> CalculationProcess:
+    """
+    Копия расчёта после ответа на текущий вопрос (current_question). Исходный расчёт не меняется.
+    В копии уже выбран следующий вопрос, либо выставлен stop, если расчёт завершён или вопросы кончились.
+    """
+    calc = copy.deepcopy(calculator)
+    calc.step(answer, calc.current_question)
+    if not calc.stop:
+        try:
+            calc.current_question = calc.get_first_question()
+        except ValueError:
+            # у самой вероятной гипотезы не осталось признаков
+            calc.stop = True
+    return calc
+
+
+class StepSignals(QObject):
+    advanced = pyqtSignal(int, int, object)  # generation, answer, CalculationProcess
+    failed = pyqtSignal(int, int, str)  # generation, answer, message
+
+
+class SpeculativeStep(QRunnable):
+    """
+    Считает в пуле потоков состояние расчёта после одного из ответов, пока пользователь читает вопрос.
+    generation отличает результаты для текущего вопроса от запоздавших результатов для прошлых.
+    """
+
+    def __init__(self, calculator: CalculationProcess, answer: int, generation: int):
+        super().__init__()
+        self.calculator = calculator
+        self.answer: int = answer
+        self.generation: int = generation
+        self.signals = StepSignals()
+
+    def run(self):
+        try:
+            calc = advance(self.calculator, self.answer)
+        except Exception as error:
+            self.signals.failed.emit(self.generation, self.answer, str(error))
+            return
+        self.signals.advanced.emit(self.generation, self.answer, calc)
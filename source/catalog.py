@@ -0,0 +1,147 @@
+# *- coding: utf-8 -*-
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from source.compression import open_text
+
+# Время изменения каталога моложе этого порога не считается надёжным: файл, созданный в тот же
+# квант времени файловой системы, мог не попасть в сохранённый список.
+_RACY_NS = 2 * 10 ** 9
+
+
+class CatalogEntry(NamedTuple):
+    mtime: int
+    size: int
+    name: str
+    signs: int
+    hypos: int
+
+
+def read_header(path: Path) -> CatalogEntry:
+    """Читает из файла базы её имя и количество признаков и гипотез."""
+    stat = path.stat()
+    if path.name.endswith('.kb.sqlite'):
+        import sqlite3
+        connection = sqlite3.connect(str(path))
+        try:
+            row = connection.execute("SELECT value FROM meta WHERE key = 'name'").fetchone()
+            signs, = connection.execute("SELECT COUNT(*) FROM signs").fetchone()
+            hypos, = connection.execute("SELECT COUNT(*) FROM hypos").fetchone()
+        except sqlite3.Error as error:
+            raise ValueError(f'{path.name}: {error}')
+        finally:
+            connection.close()
+        name = row[0] if row else ''
+    else:
+        with open_text(path, 'r') as file:
+            data = json.load(file).get('__KnowledgeBase__', {})
+        name = data.get('name', '')
+        signs = len(data.get('signs', []))
+        hypos = len(data.get('hypos', []))
+    return CatalogEntry(stat.st_mtime_ns, stat.st_size, name, signs, hypos)
+
+
+class Catalog:
+    """
+    Сохраняемый на диск кэш каталога баз знаний: для каждого файла хранит mtime, размер,
+    имя базы и количество признаков и гипотез.
+    Список файлов перечитывается только при изменении mtime каталога, данные файла - при изменении его stat.
+    """
+
+    FILE_NAME = '.catalog.json'
+
+    def __init__(self, directory: Path, suffixes: Sequence[str]):
+        self.directory: Path = directory
+        self.suffixes: Sequence[str] = suffixes
+        self.path: Path = directory / self.FILE_NAME
+        self.dir_mtime: Optional[int] = None
+        self.files: List[str] = list()
+        self.entries: Dict[str, CatalogEntry] = dict()
+        self.dirty = False
+        self.read()
+
+    def read(self):
+        try:
+            with self.path.open('r') as file:
+                data = json.load(file)
+            self.dir_mtime = data['dir_mtime']
+            self.files = data['files']
+            self.entries = {k: CatalogEntry(*v) for k, v in data['entries'].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            self.dir_mtime = None
+            self.files = list()
+            self.entries = dict()
+
+    def save(self):
+        if not self.dirty:
+            return
+        data = {
+            'dir_mtime': self.dir_mtime,
+            'files': self.files,
+            'entries': {k: list(v) for k, v in self.entries.items()},
+        }
+        # Файл переписывается на месте: создание или переименование файла изменило бы mtime каталога
+        # и обесценило бы сохранённый список. Повреждённый кэш при чтении просто сбрасывается.
+        created = not self.path.exists()
+        with self.path.open('w') as file:
+            json.dump(data, file)
+        self.dirty = False
+        if created:
+            self.dir_mtime = None
+
+    def get_file_list(self) -> List[Path]:
+        """Файлы баз в каталоге; каталог сканируется только если он изменился."""
+        mtime = self.directory.stat().st_mtime_ns
+        if mtime != self.dir_mtime or time.time_ns() - mtime < _RACY_NS:
+            files = sorted(p.name for suffix in self.suffixes for p in self.directory.glob(f'*{suffix}'))
+            if files != self.files or mtime != self.dir_mtime:
+                removed = set(self.files) - set(files)
+                for name in removed:
+                    self.entries.pop(str(self.directory / name), None)
+                self.files = files
+                self.dir_mtime = mtime
+                self.dirty = True
+        return [self.directory / name for name in self.files]
+
+    def get_entry(self, path: Path) -> Optional[CatalogEntry]:
+        """Данные о базе; файл открывается только если его mtime или размер изменились."""
+        key = str(path)
+        try:
+            stat = path.stat()
+        except OSError:
+            if self.entries.pop(key, None) is not None:
+                self.dirty = True
+            return None
+        entry = self.entries.get(key)
+        if entry is not None and entry.mtime == stat.st_mtime_ns and entry.size == stat.st_size:
+            return entry
+        try:
+            entry = read_header(path)
+        except (OSError, ValueError, AttributeError):
+            return None
+        self.entries[key] = entry
+        self.dirty = True
+        return entry
+
+    def apply_event(self, event: str, name: str, new_name: str = ''):
+        """
+        Учитывает событие наблюдателя за каталогом (added/removed/changed/renamed) без повторного сканирования.
+        Пока наблюдатель работает, он сообщит и о последующих изменениях, поэтому текущий mtime каталога
+        можно считать учтённым.
+        """
+        files = set(self.files)
+        if event in ('removed', 'renamed'):
+            files.discard(name)
+            self.entries.pop(str(self.directory / name), None)
+        if event == 'added':
+            files.add(name)
+        elif event == 'renamed':
+            files.add(new_name)
+        self.files = sorted(files)
+        try:
+            self.dir_mtime = self.directory.stat().st_mtime_ns
+        except OSError:
+            self.dir_mtime = None
+        self.dirty = True
@@ -0,0 +1,102 @@
+# *- coding: utf-8 -*-
+"""
+Лучшие следующие вопросы по базе из командной строки.
+    python -m source.cli база.kb.json [-a ID=ОТВЕТ ...] [-k 5] [--by attest|information] [-i]
+-a - уже полученные ответы (id признака и 0 - Нет ... 4 - Да) в порядке, в котором они получены.
+С -i вопросы задаются по очереди: можно ответить на первый из предложенных или выбрать другой по номеру.
+"""
+import argparse
+import sys
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from source.engine import Consultation, QuestionScore
+from source.model import ANSWER_WEIGHTS
+from source.service import load_bases
+
+ANSWER_NAMES = ('Нет', 'Скорее нет', 'Не знаю', 'Скорее да', 'Да')
+
+
+def parse_answer(text: str) -> Tuple[int, int]:
+    sign_id, _, answer = text.partition('=')
+    try:
+        result = int(sign_id), int(answer)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'"{text}" - ожидается ID=ОТВЕТ')
+    if result[1] not in ANSWER_WEIGHTS:
+        raise argparse.ArgumentTypeError(f'"{text}" - ответ должен быть одним из {sorted(ANSWER_WEIGHTS)}')
+    return result
+
+
+def print_questions(session: Consultation, scores: List[QuestionScore]):
+    base = session.base
+    print(f'{"№":>2} {"ID":>5} {"ЦС":>6} {"Инф.":>6}  Вопрос')
+    for number, score in enumerate(scores, 1):
+        print(f'{number:>2} {base.sign_ids[score.sign]:>5} {score.attest:6.3f} {score.information:6.3f}  '
+              f'{base.questions[score.sign]}')
+
+
+def print_hypos(session: Consultation, count: int = 3):
+    base = session.base
+    for h in session.ranking()[:count]:
+        print(f'   {session.p[h]:.3f}  {base.hypo_names[h]}')
+
+
+def interview(session: Consultation, k: int, by: str):
+    while not session.stop:
+        scores = session.top_questions(k, by)
+        if not scores:
+            break
+        print_questions(session, scores)
+        try:
+            text = input('Ответ 0-4 на первый вопрос или "номер ответ": ').split()
+        except EOFError:
+            return
+        try:
+            number, answer = (1, int(text[0])) if len(text) == 1 else (int(text[0]), int(text[1]))
+            score = scores[number - 1]
+        except (ValueError, IndexError):
+            print('Не понял ответ')
+            continue
+        if answer not in ANSWER_WEIGHTS:
+            answer = 2
+        session.answer(answer, score.sign)
+        print(f'{ANSWER_NAMES[answer]}: {session.base.sign_names[score.sign]}')
+        print_hypos(session)
+    print('Расчет завершен')
+    print_hypos(session)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Лучшие следующие вопросы по базе знаний')
+    parser.add_argument('path', type=Path, help='файл базы')
+    parser.add_argument('-a', '--answer', dest='answers', action='append', type=parse_answer, default=list(),
+                        metavar='ID=ОТВЕТ', help='полученный ответ; можно указать несколько раз')
+    parser.add_argument('-k', type=int, default=5, help='сколько вопросов предложить')
+    parser.add_argument('--by', choices=('attest', 'information'), default='attest',
+                        help='порядок: по ЦС самой вероятной гипотезы или по ожидаемой информации')
+    parser.add_argument('-i', '--interactive', action='store_true', help='задавать вопросы по очереди')
+    args = parser.parse_args(argv)
+
+    bases = load_bases([args.path])
+    if not bases:
+        sys.exit(1)
+    sign_index = {sign_id: i for i, sign_id in enumerate(bases[0].sign_ids)}
+    try:
+        session = Consultation(bases[0])
+        for sign_id, answer in args.answers:
+            if sign_id not in sign_index:
+                parser.error(f'в базе нет признака {sign_id}')
+            session.answer(answer, sign_index[sign_id])
+    except ValueError as error:
+        parser.error(str(error))
+    if args.interactive:
+        interview(session, args.k, args.by)
+        return
+    print_questions(session, session.top_questions(args.k, args.by))
+    print('Расчет завершен' if session.stop else 'Самые вероятные гипотезы:')
+    print_hypos(session)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+# *- coding: utf-8 -*-
+from importlib.util import find_spec
+from pathlib import Path
+from typing import IO, Callable, Dict, Optional
+
+# модули сжатия импортируются при первом открытии сжатого файла, а не при запуске приложения
+
+
+def _open_gzip(path: Path, mode: str) -> IO:
+    import gzip
+    return gzip.open(path, mode, encoding='utf-8', compresslevel=6)
+
+
+def _open_xz(path: Path, mode: str) -> IO:
+    import lzma
+    return lzma.open(path, mode, encoding='utf-8')
+
+
+def _open_zstd(path: Path, mode: str) -> IO:
+    import zstandard
+    return zstandard.open(str(path), mode, encoding='utf-8')
+
+
+# суффикс файла -> функция открытия текстового потока (path, 'rt' | 'wt')
+OPENERS: Dict[str, Callable[[Path, str], IO]] = {
+    '.gz': _open_gzip,
+    '.xz': _open_xz,
+}
+if find_spec('zstandard') is not None:
+    OPENERS['.zst'] = _open_zstd
+
+
+def is_compressed(path: Path) -> bool:
+    return path.suffix in OPENERS
+
+
+def open_text(path: Path, mode: str, suffix: Optional[str] = None) -> IO:
+    """
+    Открывает файл базы на чтение ('r') или запись ('w') как текстовый поток.
+    Сжатые файлы распаковываются и упаковываются потоком, по мере чтения и записи.
+    suffix задаёт формат, если он не следует из имени файла (например, у временного файла).
+    """
+    opener = OPENERS.get(path.suffix if suffix is None else suffix)
+    if opener is None:
+        return path.open(mode)
+    return opener(path, mode + 't')
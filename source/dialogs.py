@@ -0,0 +1,397 @@
+# *- coding: utf-8 -*-
+"""Диалоги привязки, матрицы связей и расчёта; импортируются при первом открытии, а не при запуске приложения."""
+import copy
+from typing import Dict, List, Optional, Tuple
+
+from PyQt5.QtCore import pyqtSignal, Qt, QModelIndex, QThreadPool
+from PyQt5.QtWidgets import QWidget, QHBoxLayout, QVBoxLayout, QLabel, QListWidget, QListView, QPushButton, \
+    QLineEdit, QTableView, QAction, QDialog, QApplication, QHeaderView, QInputDialog
+
+from source.calculation import ANSWERS, SpeculativeStep
+from source.engine import CompiledBase, top_questions
+from source.message import InfoMessage, QuestionMessage, CriticalMessage
+from source.model import KnowledgeBase, Hypothesis, CalculationProcess
+from source.table_models import SignValueTableModel, BaseStateTableModel, OutSignListModel, LinkMatrixModel, \
+    QuestionScoreTableModel
+
+
+class SignValueTable(QTableView):
+    remove_sign_value = pyqtSignal(int, int)  # h_id, sign_id
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.h: Optional[Hypothesis] = None
+        self.horizontalHeader().setStretchLastSection(True)
+        self.verticalHeader().setVisible(False)
+
+        self.delete_link_action = QAction("Удалить связь", self)
+        self.delete_link_action.setShortcut('Ctrl+D')
+        self.addAction(self.delete_link_action)
+
+        self.delete_link_action.triggered.connect(self.confirm_delete)
+
+    def confirm_delete(self):
+        row = self.currentIndex().row()
+        if self.hasFocus() and self.h and row >= 0:
+            model: SignValueTableModel = self.model()
+            h_id = self.h.id
+            sign_id = model.row_id(row)
+            name, p_pos, p_neg = (model.index(row, column).data() for column in (1, 2, 3))
+            message = QuestionMessage('Удалить', f'Удалить связь <{name}> <{p_pos}> <{p_neg}>?')
+            if message.exec_() == message.AcceptRole:
+                self.remove_sign_value.emit(h_id, sign_id)
+
+    def set_hypothesis(self, kb: KnowledgeBase, h: Hypothesis):
+        self.h = h
+        old = self.model()
+        if isinstance(old, SignValueTableModel):
+            old.detach()
+        self.setModel(SignValueTableModel(kb, h, self))
+        if old is not None:
+            old.deleteLater()
+        self.setColumnHidden(0, True)
+        self.resizeColumnToContents(2)
+        self.resizeColumnToContents(3)
+
+    def detach(self):
+        if isinstance(self.model(), SignValueTableModel):
+            self.model().detach()
+
+
+class LinkHypothesisDialog(QDialog):
+    def __init__(self, kb: KnowledgeBase):
+        super().__init__()
+        self.setWindowFlags(Qt.WindowSystemMenuHint | Qt.WindowTitleHint | Qt.WindowCloseButtonHint)
+        self.kb: KnowledgeBase = kb
+        self.h: Optional[Hypothesis] = None
+        self.setup_ui()
+        self.fill_hypos_list()
+        self.setup_signals()
+
+    def done(self, result: int):
+        self.included_signs_table.detach()
+        self.out_signs_model.detach()
+        super().done(result)
+
+    def new_include_sign(self, index: QModelIndex):
+        if self.h:
+            self.kb.add_link(self.h.id, self.out_signs_model.row_id(index.row()))
+
+    def fill_hypos_list(self):
+        self.hypos_list.clear()
+        self.hypos_list.addItems([h.name for h in self.kb.hypos])
+
+    def fill_signs(self, h: Hypothesis):
+        self.h = h
+        self.out_signs_model.set_hypothesis(self.h)
+        self.included_signs_table.set_hypothesis(self.kb, self.h)
+
+    def setup_signals(self):
+        self.hypos_list.itemClicked.connect(
+            lambda item: self.fill_signs(self.kb.hypos[self.hypos_list.indexFromItem(item).row()]))
+        self.unincluded_signs_list.doubleClicked.connect(self.new_include_sign)
+        self.out_signs_filter.textChanged.connect(self.out_signs_model.set_filter)
+        self.included_signs_table.remove_sign_value.connect(self.kb.delete_link)
+
+    def setup_ui(self):
+        self.overview_layout = QHBoxLayout(self)
+        # 1
+        self.include_label = QLabel('Гипотезы')
+        self.hypos_list = QListWidget(self)
+        self.hypos_layout = QVBoxLayout(self)
+        self.hypos_layout.addWidget(self.include_label)
+        self.hypos_layout.addWidget(self.hypos_list)
+        self.overview_layout.addLayout(self.hypos_layout)
+        # 2
+        self.include_label = QLabel('Входящие признаки')
+        self.included_signs_table = SignValueTable(self)
+
+        self.include_layout = QVBoxLayout(self)
+        self.include_layout.addWidget(self.include_label)
+        self.include_layout.addWidget(self.included_signs_table)
+        self.overview_layout.addLayout(self.include_layout)
+        # 3
+        self.exclude_label = QLabel('Не входящие признаки')
+        self.out_signs_model = OutSignListModel(self.kb, None, self)
+        self.unincluded_signs_list = QListView(self)
+        self.unincluded_signs_list.setModel(self.out_signs_model)
+        self.unincluded_signs_list.setUniformItemSizes(True)
+        self.exclude_layout = QVBoxLayout(self)
+        self.out_signs_filter = QLineEdit(self)
+        self.out_signs_filter.setPlaceholderText('Поиск признаков')
+        self.out_signs_filter.setClearButtonEnabled(True)
+        self.exclude_layout.addWidget(self.exclude_label)
+        self.exclude_layout.addWidget(self.out_signs_filter)
+        self.exclude_layout.addWidget(self.unincluded_signs_list)
+        self.overview_layout.addLayout(self.exclude_layout)
+
+
+class LinkMatrixView(QTableView):
+    """
+    Таблица матрицы связей. Рисуются только видимые ячейки, размеры строк и столбцов фиксированы,
+    поэтому представление не измеряет содержимое всей матрицы.
+    Ctrl+C/Ctrl+V копируют и вставляют блок ячеек в формате TSV, как в табличных редакторах;
+    одно скопированное значение вставляется во все выделенные ячейки.
+    """
+
+    COLUMN_WIDTH = 64
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.horizontalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.horizontalHeader().setDefaultSectionSize(self.COLUMN_WIDTH)
+        self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.setContextMenuPolicy(Qt.ActionsContextMenu)
+
+        self.copy_action = QAction("Копировать", self)
+        self.copy_action.setShortcut('Ctrl+C')
+        self.paste_action = QAction("Вставить", self)
+        self.paste_action.setShortcut('Ctrl+V')
+        self.fill_action = QAction("Заполнить выделение...", self)
+        self.fill_action.setShortcut('Ctrl+F')
+        self.clear_action = QAction("Удалить связи", self)
+        self.clear_action.setShortcut('Delete')
+        for action in (self.copy_action, self.paste_action, self.fill_action, self.clear_action):
+            action.setShortcutContext(Qt.WidgetShortcut)
+            self.addAction(action)
+
+        self.copy_action.triggered.connect(self.copy)
+        self.paste_action.triggered.connect(self.paste)
+        self.fill_action.triggered.connect(self.fill)
+        self.clear_action.triggered.connect(lambda: self.write([(row, column, '')
+                                                                for row, column in self.selected_cells()]))
+
+    def selected_cells(self) -> List[Tuple[int, int]]:
+        return [(row, column) for selection_range in self.selectionModel().selection()
+                for row in range(selection_range.top(), selection_range.bottom() + 1)
+                for column in range(selection_range.left(), selection_range.right() + 1)]
+
+    def top_left(self) -> Tuple[int, int]:
+        selection = self.selectionModel().selection()
+        if selection.isEmpty():
+            return self.currentIndex().row(), self.currentIndex().column()
+        return min(r.top() for r in selection), min(r.left() for r in selection)
+
+    def copy(self):
+        selection = self.selectionModel().selection()
+        if selection.isEmpty():
+            return
+        model = self.model()
+        top, left = self.top_left()
+        bottom, right = max(r.bottom() for r in selection), max(r.right() for r in selection)
+        lines = ['\t'.join(model.index(row, column).data() if self.selectionModel().isSelected(model.index(row, column))
+                           else '' for column in range(left, right + 1))
+                 for row in range(top, bottom + 1)]
+        QApplication.clipboard().setText('\n'.join(lines))
+
+    def paste(self):
+        text = QApplication.clipboard().text().replace('\r\n', '\n').rstrip('\n')
+        if not text:
+            return
+        block = [line.split('\t') for line in text.split('\n')]
+        if len(block) == 1 and len(block[0]) == 1:
+            return self.write([(row, column, block[0][0]) for row, column in self.selected_cells()])
+        top, left = self.top_left()
+        if top < 0 or left < 0:
+            return
+        rows, columns = self.model().rowCount(), self.model().columnCount()
+        self.write([(top + i, left + j, value) for i, line in enumerate(block) for j, value in enumerate(line)
+                    if top + i < rows and left + j < columns])
+
+    def fill(self):
+        cells = self.selected_cells()
+        if not cells:
+            return
+        value, ok = QInputDialog.getText(self, 'Заполнить', f'Значение для {len(cells)} ячеек '
+                                                            f'(пусто - удалить связи):')
+        if ok:
+            self.write([(row, column, value) for row, column in cells])
+
+    def write(self, cells: List[Tuple[int, int, str]]):
+        if not cells:
+            return
+        try:
+            self.model().set_values(cells)
+        except ValueError as error:
+            CriticalMessage('Ошибка ввода', str(error))
+
+
+class LinkMatrixDialog(QDialog):
+    """Все связи базы одной таблицей: признаки по строкам, по два столбца (p+, p-) на гипотезу."""
+
+    def __init__(self, kb: KnowledgeBase):
+        super().__init__()
+        self.setWindowFlags(Qt.WindowSystemMenuHint | Qt.WindowTitleHint | Qt.WindowCloseButtonHint |
+                            Qt.WindowMaximizeButtonHint)
+        self.setWindowTitle(f'Матрица связей: {kb.name}')
+        self.kb: KnowledgeBase = kb
+        self.setup_ui()
+
+    def done(self, result: int):
+        self.matrix_model.detach()
+        super().done(result)
+
+    def setup_ui(self):
+        self.v_layout = QVBoxLayout(self)
+        self.hint_label = QLabel('Пустая ячейка - признак не привязан к гипотезе. '
+                                 'Ctrl+C/Ctrl+V - копировать и вставить блок, Ctrl+F - заполнить выделение, '
+                                 'Delete - удалить связи.', self)
+        self.hint_label.setWordWrap(True)
+        self.matrix_model = LinkMatrixModel(self.kb, self)
+        self.matrix_view = LinkMatrixView(self)
+        self.matrix_view.setModel(self.matrix_model)
+        self.v_layout.addWidget(self.hint_label)
+        self.v_layout.addWidget(self.matrix_view)
+        self.resize(1000, 600)
+
+
+class BaseStateTable(QTableView):
+    def __init__(self, parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self.setModel(BaseStateTableModel(self))
+        self.horizontalHeader().setStretchLastSection(True)
+        self.verticalHeader().setVisible(False)
+
+    def fill(self, hypos: List[Hypothesis]):
+        self.model().fill(hypos)
+
+
+class QuestionScoreTable(QTableView):
+    def __init__(self, parent: Optional[QWidget] = None):
+        super().__init__(parent)
+        self.setModel(QuestionScoreTableModel(self))
+        self.setSelectionBehavior(QTableView.SelectRows)
+        self.horizontalHeader().setStretchLastSection(True)
+        self.verticalHeader().setVisible(False)
+
+
+class RunBaseDialog(QDialog):
+    """
+    Расчёт по базе. Пока пользователь читает вопрос, состояния после каждого из пяти ответов
+    считаются в пуле потоков (SpeculativeStep), так что нажатие кнопки только подставляет готовый результат.
+    Под вопросом - TOP_QUESTIONS лучших вопросов (top_questions по скомпилированной базе); двойной щелчок
+    задаёт выбранный вопрос вместо предложенного.
+    """
+
+    TOP_QUESTIONS = 5
+
+    def __init__(self, kb: KnowledgeBase):
+        super().__init__()
+        self.setWindowFlags(Qt.WindowSystemMenuHint | Qt.WindowTitleHint | Qt.WindowCloseButtonHint)
+        self.kb: KnowledgeBase = kb
+        self.kb.reset_hypothesis()
+        self.base = CompiledBase(kb)
+        self.calculator = CalculationProcess(copy.deepcopy(kb.hypos), copy.deepcopy(kb.signs), False)
+        self.generation = 0
+        self.next_states: Dict[int, CalculationProcess] = dict()
+        self.tasks: List[SpeculativeStep] = list()
+        self.pending_answer: Optional[int] = None
+        self.setup_ui()
+        self.setup_signals()
+        self.show_state()
+        self.speculate()
+
+    def speculate(self):
+        """Запускает расчёт следующего состояния для каждого ответа на текущий вопрос."""
+        self.generation += 1
+        self.next_states.clear()
+        self.tasks = [SpeculativeStep(self.calculator, answer, self.generation) for answer in ANSWERS]
+        pool = QThreadPool.globalInstance()
+        for task in self.tasks:
+            task.signals.advanced.connect(self.on_advanced)
+            task.signals.failed.connect(self.on_step_failed)
+            pool.start(task)
+
+    def on_advanced(self, generation: int, answer: int, calculator: CalculationProcess):
+        if generation != self.generation:
+            return
+        self.next_states[answer] = calculator
+        if self.pending_answer == answer:
+            self.next_step(answer)
+
+    def on_step_failed(self, generation: int, answer: int, message: str):
+        if generation == self.generation and self.pending_answer == answer:
+            self.pending_answer = None
+            self.set_buttons_enabled(True)
+            CriticalMessage('Ошибка расчета', message)
+
+    def next_step(self, value: int):
+        calculator = self.next_states.get(value)
+        if calculator is None:
+            # результат для этого ответа ещё считается - применим, когда придёт
+            self.pending_answer = value
+            self.set_buttons_enabled(False)
+            return
+        self.pending_answer = None
+        self.calculator = calculator
+        self.show_state()
+        if self.calculator.stop:
+            self.set_buttons_enabled(False)
+            InfoMessage('Остановка расчета', 'Расчет завершен!')
+        else:
+            self.set_buttons_enabled(True)
+            self.speculate()
+
+    def show_state(self):
+        self.question_label.setText('Вопрос: ' + self.kb.get_sign_by_id(self.calculator.current_question).question)
+        self.state_table.fill(self.calculator.h_list)
+        scores = list()
+        if not self.calculator.stop:
+            # гипотезы расчёта - копии гипотез базы в том же порядке; отвеченные признаки уже удалены из списка
+            remaining = {s.id for s in self.calculator.signs_to_check}
+            answered = bytearray(sign_id not in remaining for sign_id in self.base.sign_ids)
+            p = [h.p for h in self.calculator.h_list]
+            scores = top_questions(self.base, p, answered, self.TOP_QUESTIONS)
+        self.questions_table.model().fill(self.base, scores)
+
+    def choose_question(self, index: QModelIndex):
+        """Задаёт вместо текущего выбранный в списке лучших вопрос; ответы на прежний вопрос пересчитываются."""
+        sign_id = self.questions_table.model().sign_id(index.row())
+        if self.pending_answer is not None or sign_id == self.calculator.current_question:
+            return
+        # расчёт заменяется копией: SpeculativeStep прошлого вопроса ещё могут копировать прежний
+        calculator = copy.deepcopy(self.calculator)
+        calculator.current_question = sign_id
+        self.calculator = calculator
+        self.show_state()
+        self.speculate()
+
+    def set_buttons_enabled(self, enabled: bool):
+        for button in (self.no_button, self.p_no_button, self.no_know_button, self.p_yes_button, self.yes_button):
+            button.setEnabled(enabled)
+
+    def setup_signals(self):
+        self.no_button.clicked.connect(lambda: self.next_step(0))
+        self.p_no_button.clicked.connect(lambda: self.next_step(1))
+        self.no_know_button.clicked.connect(lambda: self.next_step(2))
+        self.p_yes_button.clicked.connect(lambda: self.next_step(3))
+        self.yes_button.clicked.connect(lambda: self.next_step(4))
+        self.questions_table.doubleClicked.connect(self.choose_question)
+
+    def setup_ui(self):
+        self.v_layout = QVBoxLayout(self)
+
+        self.question_label = QLabel("Вопрос: как выспаться?", self)
+        self.v_layout.addWidget(self.question_label)
+
+        # Нет - 0   Скорее нет - 1  Не знаю - 2     Скорее да - 3   Да - 4
+        self.input_layout = QHBoxLayout(self)
+        self.no_button = QPushButton('Нет', self)
+        self.p_no_button = QPushButton('Скорее нет', self)
+        self.no_know_button = QPushButton('Не знаю', self)
+        self.p_yes_button = QPushButton('Скорее да', self)
+        self.yes_button = QPushButton('Да', self)
+        self.input_layout.addWidget(self.no_button)
+        self.input_layout.addWidget(self.p_no_button)
+        self.input_layout.addWidget(self.no_know_button)
+        self.input_layout.addWidget(self.p_yes_button)
+        self.input_layout.addWidget(self.yes_button)
+        self.v_layout.addLayout(self.input_layout)
+
+        self.questions_label = QLabel('Лучшие вопросы (двойной щелчок - задать этот вопрос)', self)
+        self.v_layout.addWidget(self.questions_label)
+        self.questions_table = QuestionScoreTable(self)
+        self.v_layout.addWidget(self.questions_table)
+
+        self.state_table = BaseStateTable(self)
+        self.v_layout.addWidget(self.state_table)
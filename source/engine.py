@@ -0,0 +1,565 @@
+# *- coding: utf-8 -*-
+"""
+Расчёт по базе без GUI. База компилируется в неизменяемые массивы (CompiledBase), общие для всех сеансов;
+сеанс (Consultation) хранит только свои вероятности и отвеченные признаки.
+Шаг сеанса даёт тот же результат, что CalculationProcess.step вместе с calculation.advance.
+Скомпилированную базу можно сохранить образом (.kbc) или положить в разделяемую память: процессы подключают
+образ только для чтения, без разбора файла базы и без своей копии массивов.
+"""
+import hashlib
+import heapq
+import math
+import mmap
+import multiprocessing
+import os
+import struct
+from array import array
+from collections import OrderedDict
+from collections.abc import Sequence
+from multiprocessing import resource_tracker, shared_memory
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from source.model import ANSWER_WEIGHTS, KnowledgeBase
+
+# сигнатура, версия, резерв, отпечаток базы, гипотез, признаков, связей, строк
+_IMAGE_HEADER = struct.Struct('<4sHH32sIIII')
+_IMAGE_MAGIC = b'KBC\0'
+_IMAGE_VERSION = 1
+# массивы образа по порядку: (атрибут, тип, длина через H, S, L)
+_IMAGE_ARRAYS = (
+    ('sign_ids', 'q', lambda h, s, links: s),
+    ('hypo_ids', 'q', lambda h, s, links: h),
+    ('init_p', 'd', lambda h, s, links: h),
+    ('h_start', 'q', lambda h, s, links: h + 1),
+    ('link_sign', 'q', lambda h, s, links: links),
+    ('link_hypo', 'q', lambda h, s, links: links),
+    ('link_pos', 'd', lambda h, s, links: links),
+    ('link_neg', 'd', lambda h, s, links: links),
+    ('s_start', 'q', lambda h, s, links: s + 1),
+    ('s_links', 'q', lambda h, s, links: links),
+)
+
+
+class _Strings(Sequence):
+    """Строки образа: UTF-8 подряд и смещения; строка декодируется при обращении."""
+
+    def __init__(self, offsets: memoryview, text: memoryview, start: int, count: int):
+        self.offsets = offsets
+        self.text = text
+        self.start = start
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        i = self.start + index
+        return bytes(self.text[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+
+class CompiledBase:
+    """
+    Снимок базы для расчёта. Гипотезы и признаки адресуются номерами в порядке базы, а не id.
+    Связи лежат подряд по гипотезам в порядке Hypothesis.signs: связи гипотезы h - с h_start[h]
+    по h_start[h + 1]; номера связей признака s - s_links[s_start[s]:s_start[s + 1]].
+    fingerprint - хэш всего, что влияет на расчёт: у одинаковых баз он совпадает.
+    Базу из образа (open, attach) даёт from_image: массивы и строки - представления памяти образа,
+    который держится в owner, пока жива база.
+    """
+
+    def __init__(self, kb: KnowledgeBase):
+        self.name: str = kb.name
+        self.sign_ids = array('q', (s.id for s in kb.signs))
+        self.sign_names: Sequence = tuple(s.name for s in kb.signs)
+        self.questions: Sequence = tuple(s.question for s in kb.signs)
+        self.hypo_ids = array('q', (h.id for h in kb.hypos))
+        self.hypo_names: Sequence = tuple(h.name for h in kb.hypos)
+        self.hypo_descs: Sequence = tuple(h.desc for h in kb.hypos)
+        self.init_p = array('d', (h.init_p for h in kb.hypos))
+        sign_index = {sign_id: i for i, sign_id in enumerate(self.sign_ids)}
+
+        self.h_start = array('q', [0])
+        self.link_sign = array('q')
+        self.link_hypo = array('q')
+        self.link_pos = array('d')
+        self.link_neg = array('d')
+        for h_number, h in enumerate(kb.hypos):
+            for sv in h.signs:
+                sign_number = sign_index.get(sv.sign_id)
+                if sign_number is None:
+                    # связь с признаком, которого нет в базе, вопросом стать не может
+                    continue
+                self.link_sign.append(sign_number)
+                self.link_hypo.append(h_number)
+                self.link_pos.append(sv.p_pos)
+                self.link_neg.append(sv.p_neg)
+            self.h_start.append(len(self.link_sign))
+
+        by_sign: List[List[int]] = [list() for _ in self.sign_ids]
+        for link, sign_number in enumerate(self.link_sign):
+            by_sign[sign_number].append(link)
+        self.s_start = array('q', [0])
+        self.s_links = array('q')
+        for links in by_sign:
+            self.s_links.extend(links)
+            self.s_start.append(len(self.s_links))
+
+        digest = hashlib.sha256()
+        for part in (self.sign_ids, self.hypo_ids, self.init_p, self.h_start,
+                     self.link_sign, self.link_pos, self.link_neg):
+            digest.update(part.tobytes())
+        self.fingerprint: str = digest.hexdigest()
+        self.key: bytes = digest.digest()[:8]
+        self.owner = None
+
+    def __repr__(self):
+        return f'CompiledBase({self.name}, {len(self.hypo_ids)} H, {len(self.sign_ids)} S, {len(self.link_sign)} links)'
+
+    def to_image(self) -> bytes:
+        """
+        Образ базы: заголовок, массивы (все элементы по 8 байт, поэтому каждый выровнен), смещения строк
+        и сами строки в UTF-8 - имя базы, имена признаков, вопросы, имена и описания гипотез.
+        """
+        strings = [self.name, *self.sign_names, *self.questions, *self.hypo_names, *self.hypo_descs]
+        encoded = [text.encode('utf-8') for text in strings]
+        offsets = array('q', [0])
+        for data in encoded:
+            offsets.append(offsets[-1] + len(data))
+        header = _IMAGE_HEADER.pack(_IMAGE_MAGIC, _IMAGE_VERSION, 0, bytes.fromhex(self.fingerprint),
+                                    len(self.hypo_ids), len(self.sign_ids), len(self.link_sign), len(strings))
+        parts = [header]
+        for name, typecode, _ in _IMAGE_ARRAYS:
+            parts.append(array(typecode, getattr(self, name)).tobytes())
+        parts.append(offsets.tobytes())
+        parts.extend(encoded)
+        return b''.join(parts)
+
+    @classmethod
+    def from_image(cls, buffer, owner=None) -> 'CompiledBase':
+        """База поверх образа без копирования; ValueError, если образ повреждён или другой версии."""
+        view = memoryview(buffer).cast('B')
+        if len(view) < _IMAGE_HEADER.size:
+            raise ValueError('Образ базы обрезан')
+        magic, version, _, digest, hypos, signs, links, strings = _IMAGE_HEADER.unpack_from(view)
+        if magic != _IMAGE_MAGIC or version != _IMAGE_VERSION:
+            raise ValueError('Неизвестный формат образа базы')
+        if strings != 1 + 2 * signs + 2 * hypos:
+            raise ValueError('Образ базы повреждён')
+        base = cls.__new__(cls)
+        offset = _IMAGE_HEADER.size
+        for name, typecode, length in _IMAGE_ARRAYS + (('offsets', 'q', lambda h, s, n: strings + 1),):
+            size = 8 * length(hypos, signs, links)
+            if offset + size > len(view):
+                raise ValueError('Образ базы обрезан')
+            setattr(base, name, view[offset:offset + size].cast(typecode))
+            offset += size
+        # после строк может быть хвост: блок разделяемой памяти округляется до страницы
+        offsets = base.__dict__.pop('offsets')
+        if offset + offsets[-1] > len(view):
+            raise ValueError('Образ базы обрезан')
+        text = view[offset:offset + offsets[-1]]
+        base.name = _Strings(offsets, text, 0, 1)[0]
+        base.sign_names = _Strings(offsets, text, 1, signs)
+        base.questions = _Strings(offsets, text, 1 + signs, signs)
+        base.hypo_names = _Strings(offsets, text, 1 + 2 * signs, hypos)
+        base.hypo_descs = _Strings(offsets, text, 1 + 2 * signs + hypos, hypos)
+        base.fingerprint = digest.hex()
+        base.key = digest[:8]
+        # владелец образа - последним (и в __init__ тоже: порядок ключей общий для экземпляров класса):
+        # атрибуты освобождаются по порядку, и блок закрывается, когда представлений на него уже нет
+        base.owner = owner
+        return base
+
+    def save(self, path: Path):
+        """Записывает образ в файл; файл заменяется целиком, чтобы читатели не увидели его недописанным."""
+        temp = path.with_name(path.name + '.tmp')
+        temp.write_bytes(self.to_image())
+        temp.replace(path)
+
+    @classmethod
+    def open(cls, path: Path) -> 'CompiledBase':
+        """База из файла образа, отображённого в память только для чтения: страницы общие у всех процессов."""
+        with open(path, 'rb') as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls.from_image(mapped, mapped)
+
+    def share(self, name: Optional[str] = None) -> shared_memory.SharedMemory:
+        """
+        Кладёт образ в новый блок разделяемой памяти и возвращает блок. Удаляет блок (unlink) создатель,
+        когда подключённые процессы завершены.
+        """
+        image = self.to_image()
+        block = shared_memory.SharedMemory(name, create=True, size=len(image))
+        block.buf[:len(image)] = image
+        return block
+
+    @classmethod
+    def attach(cls, name: str) -> 'CompiledBase':
+        """База из блока разделяемой памяти, созданного share, только для чтения."""
+        try:
+            block = shared_memory.SharedMemory(name, track=False)
+        except TypeError:
+            # до Python 3.13 подключённый блок тоже попадает в resource_tracker, и тот удалил бы блок при выходе
+            # процесса; дочерние процессы multiprocessing делят трекер с создателем, и там это безвредно
+            block = shared_memory.SharedMemory(name)
+            if os.name == 'posix' and multiprocessing.parent_process() is None:
+                resource_tracker.unregister(f'/{block.name}', 'shared_memory')
+        return cls.from_image(block.buf.toreadonly(), block)
+
+
+class QuestionScore(NamedTuple):
+    sign: int  # номер признака в базе
+    attest: float  # ЦС признака для самой вероятной гипотезы, 0 - если признак с ней не связан
+    information: float  # ожидаемая информация ответа о гипотезах, связанных с признаком, бит
+
+
+def _entropy(p: float) -> float:
+    if p <= 0 or p >= 1:
+        return 0.0
+    return -p * math.log2(p) - (1 - p) * math.log2(1 - p)
+
+
+def top_questions(base: CompiledBase, p: Sequence, answered: bytearray, k: int,
+                  by: str = 'attest') -> List[QuestionScore]:
+    """
+    k лучших неотвеченных признаков при вероятностях гипотез p - за один проход по связям и частичную
+    сортировку (heapq.nlargest). by='attest' упорядочивает как выбор следующего вопроса: первым идёт тот же
+    признак, что вернёт Consultation.next_question; признаки без связи с самой вероятной гипотезой - следом,
+    по ожидаемой информации. by='information' - по ожидаемой информации.
+    Ожидаемая информация - сумма по связанным гипотезам взаимной информации гипотезы и ответа Да/Нет.
+    """
+    if by not in ('attest', 'information'):
+        raise ValueError(f'Неизвестный порядок вопросов: {by}')
+    best = max(range(len(p)), key=p.__getitem__)
+    signs = len(base.sign_ids)
+    attest = [0.0] * signs
+    information = [0.0] * signs
+    best_links: List[int] = list()
+    h_start, link_sign, link_pos, link_neg = base.h_start, base.link_sign, base.link_pos, base.link_neg
+    entropy = _entropy
+    for h in range(len(p)):
+        value = p[h]
+        prior = entropy(value)
+        start, end = h_start[h], h_start[h + 1]
+        for sign, p_pos, p_neg in zip(link_sign[start:end], link_pos[start:end], link_neg[start:end]):
+            if answered[sign]:
+                continue
+            # вероятности ответов Да и Нет; P(H|Да) и P(H|Нет) - те же выражения, что в next_question
+            yes = p_pos * value + p_neg * (1 - value)
+            no = (1 - p_pos) * value + (1 - p_neg) * (1 - value)
+            by_pos = (p_pos * value) / yes if yes > 0 else value
+            by_neg = ((1 - p_pos) * value) / no if no > 0 else value
+            information[sign] += prior - yes * entropy(by_pos) - no * entropy(by_neg)
+            if h == best:
+                attest[sign] = abs(by_pos - by_neg)
+                best_links.append(sign)
+    linked = set(best_links)
+    others = sorted((sign for sign in range(signs) if not answered[sign] and sign not in linked),
+                    key=lambda sign: -information[sign])
+    scores = [QuestionScore(sign, attest[sign], information[sign]) for sign in best_links + others]
+    # nlargest устойчив: из равных раньше идут связи самой вероятной гипотезы в их порядке, как в next_question
+    key = (lambda score: score.attest) if by == 'attest' else (lambda score: score.information)
+    return heapq.nlargest(k, scores, key=key)
+
+
+# текущий вопрос и stop перед векторами P, P min, P max в значении StateCache
+_STATE_HEADER = struct.Struct('<i?')
+# номер признака и ответ в звене цепочки ключей StateCache
+_STATE_STEP = struct.Struct('<IB')
+
+
+class StateCache:
+    """
+    Префиксное дерево путей опроса, общее для всех сеансов: узел - последовательность ответов, значение узла -
+    состояние после неё (следующий вопрос, stop, P, P min, P max).
+    Узел адресуется цепочкой хэшей: корень - CompiledBase.key (у каждой базы своё дерево), ключ ребёнка - хэш
+    ключа родителя, номера признака и ответа. Так шаг вниз по дереву - один хэш и один поиск в словаре,
+    а сеанс держит только ключ своего узла.
+    Ключ - именно последовательность, а не множество ответов: умножение на R не перестановочно с пересчётом P
+    по Байесу, а P min и P max накапливаются по шагам, так что состояние зависит от порядка. Сеансы, которые
+    идут по вопросам расчёта, при одном множестве ответов проходят их в одном порядке - попадания те же.
+    Вытеснение - сегментированный LRU: новый узел попадает в пробный сегмент, повторно запрошенный переходит
+    в защищённый (до PROTECTED_RATIO памяти), вытесняются давние узлы пробного сегмента. Первые шаги, общие
+    у большинства сеансов, остаются в защищённом сегменте, а поток редких глубоких путей их не вытесняет.
+    Память считается по размеру значений плюс ENTRY_OVERHEAD на узел.
+    """
+
+    ENTRY_OVERHEAD = 150
+    PROTECTED_RATIO = 0.8
+    # попадания и промахи считаются отдельно для узлов глубиной до DEPTH_STATS - 1 ответов
+    DEPTH_STATS = 8
+
+    def __init__(self, max_bytes: int = 64 * 2 ** 20):
+        self.max_bytes: int = max_bytes
+        self.probation: 'OrderedDict[bytes, bytes]' = OrderedDict()
+        self.protected: 'OrderedDict[bytes, bytes]' = OrderedDict()
+        self.total: int = 0
+        self.protected_total: int = 0
+        self.stats: Dict[str, int] = {'hits': 0, 'misses': 0, 'promoted': 0, 'evicted': 0}
+        self.depth_hits: List[int] = [0] * self.DEPTH_STATS
+        self.depth_misses: List[int] = [0] * self.DEPTH_STATS
+
+    def __len__(self) -> int:
+        return len(self.probation) + len(self.protected)
+
+    def _size(self, value: bytes) -> int:
+        return len(value) + self.ENTRY_OVERHEAD
+
+    @staticmethod
+    def chain(key: bytes, question: int, answer: int) -> bytes:
+        return hashlib.blake2b(key + _STATE_STEP.pack(question, answer), digest_size=16).digest()
+
+    def get(self, key: bytes, depth: int = 0) -> Optional[bytes]:
+        """Состояние узла; depth - число ответов в пути, только для статистики."""
+        depth = min(depth, self.DEPTH_STATS - 1)
+        value = self.protected.get(key)
+        if value is not None:
+            self.protected.move_to_end(key)
+        else:
+            value = self.probation.pop(key, None)
+            if value is None:
+                self.stats['misses'] += 1
+                self.depth_misses[depth] += 1
+                return None
+            self.promote(key, value)
+        self.stats['hits'] += 1
+        self.depth_hits[depth] += 1
+        return value
+
+    def promote(self, key: bytes, value: bytes):
+        """Переводит узел в защищённый сегмент; его давние узлы при переполнении возвращаются в пробный."""
+        self.protected[key] = value
+        self.protected_total += self._size(value)
+        self.stats['promoted'] += 1
+        while self.protected_total > self.max_bytes * self.PROTECTED_RATIO:
+            old_key, old = self.protected.popitem(last=False)
+            self.protected_total -= self._size(old)
+            self.probation[old_key] = old
+
+    def put(self, key: bytes, value: bytes):
+        if key in self.probation or key in self.protected:
+            return
+        self.probation[key] = value
+        self.total += self._size(value)
+        while self.total > self.max_bytes and self.probation:
+            _, old = self.probation.popitem(last=False)
+            self.total -= self._size(old)
+            self.stats['evicted'] += 1
+
+    def report(self) -> dict:
+        return dict(self.stats, states=len(self), protected=len(self.protected), bytes=self.total,
+                    max_bytes=self.max_bytes, depth_hits=self.depth_hits, depth_misses=self.depth_misses)
+
+
+# версия формата, флаги (1 - stop), начало отпечатка базы, гипотез, ответов, текущий вопрос
+_BLOB_HEADER = struct.Struct('<BB8sIIi')
+_BLOB_VERSION = 1
+
+
+class Consultation:
+    """
+    Сеанс расчёта по CompiledBase. Первый вопрос - первый признак базы, следующий - неотвеченный признак
+    с наибольшей ценностью для самой вероятной гипотезы. После ответа пересчитываются P, P min и P max;
+    расчёт останавливается, когда P min меньше наименьшей P max осталась не более чем у одной гипотезы.
+    С cache состояние после каждого ответа берётся из StateCache или кладётся туда; path - ключ сеанса в кэше.
+    """
+
+    __slots__ = ('base', 'p', 'p_min', 'p_max', 'answered', 'answers', 'current', 'stop', 'cache', 'path')
+
+    def __init__(self, base: CompiledBase, cache: Optional[StateCache] = None):
+        if not base.sign_ids:
+            raise ValueError('В базе нет признаков')
+        if not base.hypo_ids:
+            raise ValueError('В базе нет гипотез')
+        self.base: CompiledBase = base
+        self.p = array('d', base.init_p)
+        self.p_min = array('d', base.init_p)
+        self.p_max = array('d', base.init_p)
+        self.answered = bytearray(len(base.sign_ids))
+        self.answers: List[Tuple[int, int]] = list()  # (номер признака, ответ)
+        self.current: int = 0
+        self.stop: bool = False
+        self.cache: Optional[StateCache] = cache
+        self.path: bytes = base.key
+
+    def answer(self, answer: int, question: Optional[int] = None):
+        """
+        Ответ на текущий вопрос (0 - Нет ... 4 - Да, прочее - Не знаю). С question - ответ на любой неотвеченный
+        признак, в том числе после останова: порядок вопросов выбирает интервьюер.
+        """
+        if question is None:
+            if self.stop:
+                raise ValueError('Расчёт уже завершён')
+            question = self.current
+        elif not 0 <= question < len(self.answered) or self.answered[question]:
+            raise ValueError('На этот признак ответ уже получен или признака нет в базе')
+        if answer not in ANSWER_WEIGHTS:
+            answer = 2
+        self.path = StateCache.chain(self.path, question, answer)
+        state = self.cache.get(self.path, len(self.answers) + 1) if self.cache is not None else None
+        if state is not None:
+            self.answered[question] = 1
+            self.answers.append((question, answer))
+            self.load_state(state)
+            return
+        positive, r = ANSWER_WEIGHTS[answer]
+        base, p = self.base, self.p
+        for link in base.s_links[base.s_start[question]:base.s_start[question + 1]]:
+            h, p_pos, p_neg = base.link_hypo[link], base.link_pos[link], base.link_neg[link]
+            value = p[h]
+            if positive:
+                value = (p_pos * value) / ((p_pos * value) + p_neg * (1 - value))
+            else:
+                value = ((1 - p_pos) * value) / ((1 - p_pos) * value + (1 - p_neg) * (1 - value))
+            p[h] = value * r
+        self.answered[question] = 1
+        self.answers.append((question, answer))
+        self.update_bounds()
+        if not self.stop:
+            question = self.next_question()
+            if question < 0:
+                # у самой вероятной гипотезы признаки кончились
+                self.stop = True
+            else:
+                self.current = question
+        if self.cache is not None:
+            self.cache.put(self.path, self.dump_state())
+
+    def dump_state(self) -> bytes:
+        """Текущий вопрос, stop, P, P min и P max - всё, что меняет ответ, кроме списка ответов."""
+        return b''.join((_STATE_HEADER.pack(self.current, self.stop),
+                         self.p.tobytes(), self.p_min.tobytes(), self.p_max.tobytes()))
+
+    def load_state(self, state: bytes):
+        self.current, self.stop = _STATE_HEADER.unpack_from(state)
+        size = 8 * len(self.p)
+        offset = _STATE_HEADER.size
+        for name in ('p', 'p_min', 'p_max'):
+            vector = array('d')
+            vector.frombytes(state[offset:offset + size])
+            setattr(self, name, vector)
+            offset += size
+
+    @classmethod
+    def replay(cls, base: CompiledBase, answers: List[Tuple[int, int]],
+               cache: Optional[StateCache] = None) -> 'Consultation':
+        """
+        Сеанс после ответов answers ((номер признака, ответ)) в их порядке. Если итоговое состояние есть в cache,
+        промежуточные шаги не считаются.
+        """
+        session = cls(base, cache)
+        if cache is not None and answers:
+            path = base.key
+            for question, answer in answers:
+                path = StateCache.chain(path, question, answer)
+            state = cache.get(path, len(answers))
+            if state is not None:
+                for question, _ in answers:
+                    session.answered[question] = 1
+                session.answers = list(answers)
+                session.path = path
+                session.load_state(state)
+                return session
+        for question, answer in answers:
+            session.answer(answer, question)
+        return session
+
+    def update_bounds(self):
+        """P min и P max по неотвеченным признакам и проверка останова."""
+        base, answered, p_min, p_max = self.base, self.answered, self.p_min, self.p_max
+        h_start, link_sign, link_pos, link_neg = base.h_start, base.link_sign, base.link_pos, base.link_neg
+        for h in range(len(p_min)):
+            low, high = p_min[h], p_max[h]
+            for link in range(h_start[h], h_start[h + 1]):
+                if answered[link_sign[link]]:
+                    continue
+                p_pos, p_neg = link_pos[link], link_neg[link]
+                low = ((1 - p_pos) * low) / ((1 - p_pos) * low + (1 - p_neg) * (1 - low))
+                high = (p_pos * high) / ((p_pos * high) + p_neg * (1 - high))
+            p_min[h], p_max[h] = low, high
+        threshold = min(p_max)
+        self.stop = sum(1 for low in p_min if low < threshold) <= 1
+
+    def best(self) -> int:
+        """Номер самой вероятной гипотезы (первой из равных)."""
+        p = self.p
+        return max(range(len(p)), key=p.__getitem__)
+
+    def next_question(self) -> int:
+        """Номер следующего вопроса или -1, если у самой вероятной гипотезы не осталось неотвеченных признаков."""
+        base, answered, h = self.base, self.answered, self.best()
+        p = self.p[h]
+        question, best_value = -1, -1.0
+        for link in range(base.h_start[h], base.h_start[h + 1]):
+            sign_number = base.link_sign[link]
+            if answered[sign_number]:
+                continue
+            p_pos, p_neg = base.link_pos[link], base.link_neg[link]
+            value = abs((p_pos * p) / ((p_pos * p) + p_neg * (1 - p)) -
+                        ((1 - p_pos) * p) / ((1 - p_pos) * p + (1 - p_neg) * (1 - p)))
+            if value > best_value:
+                question, best_value = sign_number, value
+        return question
+
+    def top_questions(self, k: int, by: str = 'attest') -> List[QuestionScore]:
+        """k лучших следующих вопросов (см. top_questions)."""
+        return top_questions(self.base, self.p, self.answered, k, by)
+
+    def ranking(self) -> List[int]:
+        """Номера гипотез по убыванию P."""
+        p = self.p
+        return sorted(range(len(p)), key=lambda h: -p[h])
+
+    def to_bytes(self) -> bytes:
+        """
+        Состояние сеанса одной строкой байт: заголовок, P, P min, P max (float64), битовая маска отвеченных
+        признаков и история ответов (номера признаков uint32, ответы uint8). База в blob не входит -
+        только начало её отпечатка, по которому from_bytes проверяет, что база та же.
+        """
+        count = len(self.answers)
+        bits = bytearray((len(self.answered) + 7) // 8)
+        signs = array('I', (question for question, _ in self.answers))
+        for question in signs:
+            bits[question >> 3] |= 1 << (question & 7)
+        header = _BLOB_HEADER.pack(_BLOB_VERSION, int(self.stop), self.base.key, len(self.p), count, self.current)
+        return b''.join((header, self.p.tobytes(), self.p_min.tobytes(), self.p_max.tobytes(), bits,
+                         signs.tobytes(), bytes(answer for _, answer in self.answers)))
+
+    @staticmethod
+    def base_key(blob: bytes) -> bytes:
+        """Начало отпечатка базы, по которой создан сеанс (CompiledBase.key)."""
+        return _BLOB_HEADER.unpack_from(blob)[2]
+
+    @classmethod
+    def from_bytes(cls, base: CompiledBase, blob: bytes, cache: Optional[StateCache] = None) -> 'Consultation':
+        version, flags, key, hypos, count, current = _BLOB_HEADER.unpack_from(blob)
+        sign_count = len(base.sign_ids)
+        size = _BLOB_HEADER.size + 3 * 8 * hypos + (sign_count + 7) // 8 + 5 * count
+        if version != _BLOB_VERSION or key != base.key or hypos != len(base.hypo_ids) or len(blob) != size:
+            raise ValueError('Состояние сеанса не подходит к базе')
+        session = cls.__new__(cls)
+        session.base = base
+        offset = _BLOB_HEADER.size
+        for name in ('p', 'p_min', 'p_max'):
+            vector = array('d')
+            vector.frombytes(blob[offset:offset + 8 * hypos])
+            setattr(session, name, vector)
+            offset += 8 * hypos
+        bits = blob[offset:offset + (sign_count + 7) // 8]
+        session.answered = bytearray((bits[i >> 3] >> (i & 7)) & 1 for i in range(sign_count))
+        offset += len(bits)
+        signs = array('I')
+        signs.frombytes(blob[offset:offset + 4 * count])
+        session.answers = list(zip(signs, blob[offset + 4 * count:]))
+        session.current = current
+        session.stop = bool(flags & 1)
+        session.cache = cache
+        session.path = base.key
+        for question, answer in session.answers:
+            session.path = StateCache.chain(session.path, question, answer)
+        return session
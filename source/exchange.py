@@ -0,0 +1,122 @@
+# *- coding: utf-8 -*-
+"""
+Обмен базами знаний с электронными таблицами.
+База хранится в каталоге из четырёх таблиц CSV (или TSV):
+    signs    - sign_id, name, question
+    hypos    - hypothesis_id, name, p, description
+    p_pos    - матрица p+: строка на признак (первый столбец sign_id), столбец на гипотезу (заголовок hypothesis_id)
+    p_neg    - матрица p- того же вида
+Пустая ячейка матрицы означает, что признак не привязан к гипотезе.
+"""
+import csv
+from itertools import zip_longest
+from pathlib import Path
+from typing import Dict, List
+
+from source.model import KnowledgeBase, Sign, SignValue, Hypothesis
+
+
+def _table_path(directory: Path, table: str, delimiter: str) -> Path:
+    return directory / (table + ('.tsv' if delimiter == '\t' else '.csv'))
+
+
+def _detect_delimiter(directory: Path) -> str:
+    return '\t' if (directory / 'signs.tsv').exists() else ','
+
+
+def _float(value: str) -> float:
+    return float(value.replace(',', '.'))
+
+
+def _probability(value: str, table: str, line: int) -> float:
+    p = _float(value)
+    if not 0 <= p <= 1:
+        raise ValueError(f'{table}, строка {line}: вероятность {value} вне [0; 1]')
+    return p
+
+
+def export_csv(kb: KnowledgeBase, directory: Path, delimiter: str = ','):
+    directory.mkdir(parents=True, exist_ok=True)
+    with _table_path(directory, 'signs', delimiter).open('w', encoding='utf-8', newline='') as file:
+        w = csv.writer(file, delimiter=delimiter, lineterminator='\n')
+        w.writerow(['sign_id', 'name', 'question'])
+        w.writerows([s.id, s.name, s.question] for s in kb.signs)
+
+    with _table_path(directory, 'hypos', delimiter).open('w', encoding='utf-8', newline='') as file:
+        w = csv.writer(file, delimiter=delimiter, lineterminator='\n')
+        w.writerow(['hypothesis_id', 'name', 'p', 'description'])
+        w.writerows([h.id, h.name, h.init_p, h.desc] for h in kb.hypos)
+
+    # столбец матрицы - гипотеза; словари по sign_id, чтобы не искать связь перебором
+    columns: List[Dict[int, SignValue]] = [{sv.sign_id: sv for sv in h.signs} for h in kb.hypos]
+    header = ['sign_id'] + [h.id for h in kb.hypos]
+    for table, attr in (('p_pos', 'p_pos'), ('p_neg', 'p_neg')):
+        with _table_path(directory, table, delimiter).open('w', encoding='utf-8', newline='') as file:
+            w = csv.writer(file, delimiter=delimiter, lineterminator='\n')
+            w.writerow(header)
+            for s in kb.signs:
+                row = [s.id]
+                for links in columns:
+                    sv = links.get(s.id)
+                    row.append('' if sv is None else getattr(sv, attr))
+                w.writerow(row)
+
+
+def import_csv(directory: Path) -> KnowledgeBase:
+    """
+    Собирает базу из таблиц каталога. Таблицы читаются построчно, матрицы p+ и p- - параллельно,
+    так что в памяти держится только собираемая база.
+    Ошибки в содержимом таблиц - ValueError (или IndexError, если в строке не хватает столбцов).
+    """
+    try:
+        return _read_tables(directory)
+    except csv.Error as error:
+        raise ValueError(f'Неверный формат таблицы: {error}')
+
+
+def _read_tables(directory: Path) -> KnowledgeBase:
+    delimiter = _detect_delimiter(directory)
+    kb = KnowledgeBase()
+    kb.name = directory.name
+
+    with _table_path(directory, 'signs', delimiter).open('r', encoding='utf-8', newline='') as file:
+        rows = csv.reader(file, delimiter=delimiter)
+        next(rows, None)
+        kb.signs = [Sign(int(row[0]), row[1], row[2]) for row in rows if row]
+
+    with _table_path(directory, 'hypos', delimiter).open('r', encoding='utf-8', newline='') as file:
+        rows = csv.reader(file, delimiter=delimiter)
+        next(rows, None)
+        kb.hypos = [Hypothesis(int(row[0]), row[1], row[3] if len(row) > 3 else '',
+                               _probability(row[2], 'hypos', rows.line_num))
+                    for row in rows if row]
+
+    sign_ids = {s.id for s in kb.signs}
+    hypos = {h.id: h for h in kb.hypos}
+    with _table_path(directory, 'p_pos', delimiter).open('r', encoding='utf-8', newline='') as pos_file, \
+            _table_path(directory, 'p_neg', delimiter).open('r', encoding='utf-8', newline='') as neg_file:
+        pos_rows = csv.reader(pos_file, delimiter=delimiter)
+        neg_rows = csv.reader(neg_file, delimiter=delimiter)
+        pos_header = next(pos_rows, None)
+        neg_header = next(neg_rows, None)
+        if pos_header is None or neg_header is None:
+            raise ValueError(f'Пустая матрица {"p_pos" if pos_header is None else "p_neg"}')
+        if pos_header != neg_header:
+            raise ValueError('Заголовки матриц p+ и p- не совпадают')
+        try:
+            columns = [hypos[int(h_id)].signs for h_id in pos_header[1:]]
+        except KeyError as error:
+            raise ValueError(f'Матрица ссылается на неизвестную гипотезу {error.args[0]}')
+        for line, (pos, neg) in enumerate(zip_longest(pos_rows, neg_rows), start=2):
+            if pos is None or neg is None or pos[:1] != neg[:1]:
+                raise ValueError(f'Строка {line}: строки матриц p+ и p- не совпадают')
+            if not pos:
+                continue
+            sign_id = int(pos[0])
+            if sign_id not in sign_ids:
+                raise ValueError(f'Строка {line}: неизвестный признак {sign_id}')
+            for signs, p_pos, p_neg in zip(columns, pos[1:], neg[1:]):
+                if p_pos or p_neg:
+                    signs.append(SignValue(sign_id, _probability(p_pos or '0.5', 'p_pos', line),
+                                           _probability(p_neg or '0.5', 'p_neg', line)))
+    return kb
@@ -0,0 +1,57 @@
+# *- coding: utf-8 -*-
+import threading
+from pathlib import Path
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from source.model import AppModel
+
+
+class LoadCancelled(Exception):
+    pass
+
+
+class LoaderSignals(QObject):
+    progress = pyqtSignal(int, int)  # прочитано, всего (0 - неизвестно)
+    loaded = pyqtSignal(object)  # KnowledgeBase
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+
+class BaseLoader(QRunnable):
+    """
+    Читает базу знаний в пуле потоков (QThreadPool) через AppModel.read_base, в обход кэша.
+    Результат приходит сигналами в поток GUI; положить базу в кэш должен получатель сигнала loaded.
+    """
+
+    def __init__(self, app_model: AppModel, path: Path, lazy: bool = False):
+        super().__init__()
+        self.app_model = app_model
+        self.path: Path = path
+        self.lazy: bool = lazy
+        self.signals = LoaderSignals()
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def on_progress(self, done: int, total: int):
+        if self.cancel_event.is_set():
+            raise LoadCancelled()
+        self.signals.progress.emit(done, total)
+
+    def run(self):
+        try:
+            kb = self.app_model.read_base(self.path, self.lazy, self.on_progress)
+        except LoadCancelled:
+            self.signals.cancelled.emit()
+            return
+        except Exception as error:
+            self.signals.failed.emit(f'{self.path.name}: {error}')
+            return
+        if self.cancel_event.is_set():
+            if kb._storage is not None:
+                kb._storage.close()
+            self.signals.cancelled.emit()
+            return
+        self.signals.loaded.emit(kb)
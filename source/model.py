@@ -1,15 +1,38 @@
 # *- coding: utf-8 -*-
 
-from typing import Optional, Any, List, Set, Tuple
+from typing import TYPE_CHECKING, Optional, Any, Dict, List, Set, Tuple, Callable
+import copy
 import json
-from pathlib import Path, WindowsPath
+import os
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+
+from source.cache import BaseCache
+from source.catalog import Catalog, CatalogEntry
+from source.compression import OPENERS, open_text, is_compressed
+
+if TYPE_CHECKING:
+    from source.search import SearchIndex
+
+
+def _state(o: Any) -> dict:
+    """Сохраняемые поля объекта: всё, кроме перечисленных в _TRANSIENT. Ленивые поля предварительно загружаются."""
+    if isinstance(o, _LazyFields):
+        o.load_all()
+    transient = getattr(o, '_TRANSIENT', ())
+    return {k: v for k, v in o.__dict__.items() if k not in transient}
+
+
+def _type_name(o: Any) -> str:
+    return getattr(o, '_BASE', o.__class__).__name__
 
 
 class _ModelEncoder(json.JSONEncoder):
     def default(self, o: Any) -> Any:
-        if isinstance(o, WindowsPath):
+        if isinstance(o, Path):
             return {'__{}__'.format(o.__class__.__name__): str(o.resolve())}
-        return {'__{}__'.format(o.__class__.__name__): o.__dict__}
+        return {'__{}__'.format(_type_name(o)): _state(o)}
 
 
 def _model_decoder(o):
@@ -32,6 +55,9 @@ def _model_decoder(o):
     elif '__WindowsPath__' in o:
         obj = Path(o['__WindowsPath__']).resolve()
         return obj
+    elif '__PosixPath__' in o:
+        obj = Path(o['__PosixPath__']).resolve()
+        return obj
     return o
 
 
@@ -241,6 +267,73 @@ class Hypothesis:
         return self.p_min
 
 
+class _LazyFields:
+    """
+    Поля из _LAZY не хранятся в объекте до первого обращения: их возвращает loader(name).
+    Загруженное значение кладётся в __dict__, так что дальше объект ведёт себя как обычный.
+    """
+
+    _LAZY: Tuple[str, ...] = ()
+    _BASE: type = object
+    _TRANSIENT = ('_loader',)
+
+    def __getattr__(self, name):
+        loader = self.__dict__.get('_loader')
+        if loader is None or name not in self._LAZY:
+            raise AttributeError(name)
+        value = loader(name)
+        self.__dict__[name] = value
+        return value
+
+    def load_all(self):
+        for name in self._LAZY:
+            getattr(self, name)
+
+    def __deepcopy__(self, memo):
+        obj = self._BASE.__new__(self._BASE)
+        memo[id(self)] = obj
+        obj.__dict__.update(copy.deepcopy(_state(self), memo))
+        return obj
+
+
+class LazySign(_LazyFields, Sign):
+    """Признак, у которого вопрос читается из источника при первом обращении."""
+
+    _LAZY = ('question',)
+    _BASE = Sign
+
+    def __init__(self, sign_id: int, name: str, loader: Callable[[str], Any]):
+        self.id: int = sign_id
+        self.name: str = name
+        self._loader = loader
+
+
+class LazyHypothesis(_LazyFields, Hypothesis):
+    """Гипотеза, у которой описание и связи с признаками читаются из источника при первом обращении."""
+
+    _LAZY = ('desc', 'signs')
+    _BASE = Hypothesis
+
+    def __init__(self, h_id: int, name: str, p: float, loader: Callable[[str], Any]):
+        self.id = h_id
+        self.name: str = name
+        self._init_p: float = p
+        self.p = self._init_p
+        self.p_max = self._init_p
+        self.p_min = self._init_p
+        self._loader = loader
+
+
+# ответ -> (признак есть, вес ответа r): Нет, Скорее нет, Не знаю, Скорее да, Да
+ANSWER_WEIGHTS: Dict[int, Tuple[bool, float]] = {
+    0: (False, 1.0),
+    1: (False, 0.75),
+    2: (True, 0.5),
+    3: (True, 0.75),
+    4: (True, 1.0)
+}
+
+
 class CalculationProcess:
     """
         2) Находим 1-ый вопрос с макс. ЦС
@@ -345,16 +438,9 @@ class CalculationProcess:
         Скорее да - 3 → (True, 0.75)
         Да - 4 → (True, 1.0)
         """
-        choice = {
-            0: (False, 1.0),
-            1: (False, 0.75),
-            2: (True, 0.5),
-            3: (True, 0.75),
-            4: (True, 1.0)
-        }
-        if answer not in list(choice.keys()):
+        if answer not in ANSWER_WEIGHTS:
             answer = 2
-        return choice[answer]
+        return ANSWER_WEIGHTS[answer]
 
     def recount_ps(self, sign_id: int, answer: bool, r: float):
         for h in self.h_list:
@@ -450,27 +536,198 @@ class CalculationProcess:
         return self.get_max_h()
 
 
+class _LinkIndex:
+    """
+    Индексы базы знаний: признаки и гипотезы по id и связи в обе стороны
+    (гипотеза -> признаки, признак -> гипотезы). Связи гипотезы индексируются при первом обращении к ней,
+    обратный индекс - при первом обратном запросе, так что ленивые гипотезы не загружаются заранее.
+    """
+
+    def __init__(self, kb: 'KnowledgeBase'):
+        self.kb = kb
+        self.signs: Dict[int, Sign] = {s.id: s for s in kb.signs}
+        self.hypos: Dict[int, Hypothesis] = {h.id: h for h in kb.hypos}
+        self.by_hypo: Dict[int, Dict[int, SignValue]] = dict()
+        self.by_sign: Optional[Dict[int, Dict[int, SignValue]]] = None
+
+    def hypothesis_links(self, h: Hypothesis) -> Dict[int, SignValue]:
+        links = self.by_hypo.get(h.id)
+        if links is None:
+            links = self.by_hypo[h.id] = {sv.sign_id: sv for sv in h.signs}
+        return links
+
+    def sign_links(self, sign_id: int) -> Dict[int, SignValue]:
+        if self.by_sign is None:
+            self.by_sign = {s_id: dict() for s_id in self.signs}
+            for h in self.kb.hypos:
+                for s_id, sv in self.hypothesis_links(h).items():
+                    self.by_sign.setdefault(s_id, dict())[h.id] = sv
+        return self.by_sign.setdefault(sign_id, dict())
+
+    def add_link(self, h_id: int, sv: SignValue):
+        if h_id in self.by_hypo:
+            self.by_hypo[h_id][sv.sign_id] = sv
+        if self.by_sign is not None:
+            self.by_sign.setdefault(sv.sign_id, dict())[h_id] = sv
+
+    def remove_link(self, h_id: int, sign_id: int):
+        if h_id in self.by_hypo:
+            self.by_hypo[h_id].pop(sign_id, None)
+        if self.by_sign is not None and sign_id in self.by_sign:
+            self.by_sign[sign_id].pop(h_id, None)
+
+
+class _Batch:
+    """Накопленные в пакете изменения: события для подписчиков и функции отката."""
+
+    def __init__(self):
+        self.events: List[tuple] = list()
+        self.undo: List[Callable[[], None]] = list()
+
+    def rollback(self):
+        for undo in reversed(self.undo):
+            undo()
+
+
 class KnowledgeBase:
-    """База знаний. Состоит из признаков и гипотез."""
+    """
+    База знаний. Состоит из признаков и гипотез.
+    Изменения через методы базы сообщаются подписчикам: listener(event, *ids), где event один из
+    sign_added/sign_changed/sign_deleted, hypos_added/hypos_changed/hypos_deleted,
+    link_added/link_changed/link_deleted.
+    Методы базы поддерживают индекс связей и поисковый индекс;
+    если списки signs/hypos или поля объектов меняются напрямую, нужно вызвать reset_index.
+    Внутри `with kb.batch():` события копятся и после проверки уходят подписчикам одним событием
+    batch со списком кортежей (event, *ids).
+    """
+
+    _TRANSIENT = ('_listeners', '_storage', '_index', '_search', '_batch')
 
     def __init__(self):
         self.name = "New Knowledge Base"
         self.last_path: Path = Path('')
         self.signs: List[Sign] = list()
         self.hypos: List[Hypothesis] = list()
+        self._listeners: List[Callable[..., None]] = list()
+        self._storage = None
+        self._index: Optional[_LinkIndex] = None
+        self._search: Optional['SearchIndex'] = None
+        self._batch: Optional[_Batch] = None
 
     def __repr__(self):
         return f"KnowledgeBase(\n    {self.signs},\n    {self.hypos}\n)"
 
+    def subscribe(self, listener: Callable[..., None]):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[..., None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _notify(self, event: str, *ids: int):
+        if self._batch is not None:
+            self._batch.events.append((event,) + ids)
+            return
+        for listener in list(self._listeners):
+            listener(event, *ids)
+
+    def _on_undo(self, undo: Callable[[], None]):
+        if self._batch is not None:
+            self._batch.undo.append(undo)
+
+    @contextmanager
+    def batch(self):
+        """
+        Пакет изменений: все правки внутри блока проверяются один раз в конце (validate) и
+        сообщаются подписчикам одним событием batch. Если блок завершился исключением
+        или проверка не прошла, правки откатываются.
+        Обратный индекс связей на время пакета сбрасывается и строится заново не более одного раза.
+        """
+        if self._batch is not None:
+            yield self
+            return
+        batch = self._batch = _Batch()
+        if self._index is not None:
+            self._index.by_sign = None
+        try:
+            yield self
+            problems = self.validate(batch.events)
+            if problems:
+                raise ValueError('\n'.join(problems))
+        except BaseException:
+            self._batch = None
+            batch.rollback()
+            self.reset_index()
+            raise
+        self._batch = None
+        if batch.events:
+            self._notify('batch', batch.events)
+
+    def validate(self, events: Optional[List[tuple]] = None) -> List[str]:
+        """Проверяет вероятности; если переданы события пакета, то только затронутые ими гипотезы и связи."""
+        problems = list()
+        if events is None:
+            hypos = self.hypos
+            links = [(h, sv) for h in self.hypos for sv in h.signs]
+        else:
+            hypos = [self.get_hypothesis_by_id(e[1]) for e in events if e[0] in ('hypos_added', 'hypos_changed')]
+            links = [(self.get_hypothesis_by_id(e[1]), self.get_link(e[1], e[2])) for e in events
+                     if e[0] in ('link_added', 'link_changed')]
+        for h in hypos:
+            if h is not None and not 0 <= h.init_p <= 1:
+                problems.append(f'Гипотеза {h.name}: вероятность {h.init_p} вне [0; 1]')
+        for h, sv in links:
+            if sv is not None and not (0 <= sv.p_pos <= 1 and 0 <= sv.p_neg <= 1):
+                problems.append(f'Гипотеза {h.name}, признак {sv.sign_id}: p+ {sv.p_pos}, p- {sv.p_neg} вне [0; 1]')
+        return problems
+
+    def load_all(self):
+        """Загружает ленивые поля всех признаков и гипотез; нужно до закрытия источника, из которого они читаются."""
+        for o in self.signs + self.hypos:
+            if isinstance(o, _LazyFields):
+                o.load_all()
+
+    @property
+    def index(self) -> _LinkIndex:
+        if self._index is None:
+            self._index = _LinkIndex(self)
+        return self._index
+
+    def reset_index(self):
+        self._index = None
+        self._search = None
+
+    @property
+    def search_index(self) -> 'SearchIndex':
+        if self._search is None:
+            from source.search import SearchIndex
+            self._search = SearchIndex(self)
+        return self._search
+
+    def search_signs(self, query: str) -> List[Sign]:
+        """Признаки, в названии или вопросе которых есть все слова запроса, в порядке базы."""
+        found = self.search_index.signs.find(query)
+        return [s for s in self.signs if s.id in found]
+
+    def search_hypos(self, query: str) -> List[Hypothesis]:
+        """Гипотезы, в названии или описании которых есть все слова запроса, в порядке базы."""
+        found = self.search_index.hypos.find(query)
+        return [h for h in self.hypos if h.id in found]
+
     def get_hypothesis_by_id(self, target_id: int) -> Hypothesis:
-        for h in self.hypos:
-            if h.id == target_id:
-                return h
+        return self.index.hypos.get(target_id)
 
     def get_sign_by_id(self, target_id: int) -> Sign:
-        for s in self.signs:
-            if s.id == target_id:
-                return s
+        return self.index.signs.get(target_id)
+
+    def get_link(self, h_id: int, sign_id: int) -> Optional[SignValue]:
+        h = self.get_hypothesis_by_id(h_id)
+        return self.index.hypothesis_links(h).get(sign_id) if h else None
+
+    def get_hypotheses_with_sign(self, sign_id: int) -> List[Hypothesis]:
+        """Гипотезы, к которым привязан признак, - без перебора всех гипотез."""
+        hypos = self.index.hypos
+        return [hypos[h_id] for h_id in self.index.sign_links(sign_id)]
 
     def reset_hypothesis(self):
         for h in self.hypos:
@@ -481,7 +738,8 @@ class KnowledgeBase:
         return [self.get_sign_by_id(sv.sign_id) for sv in h.signs]
 
     def get_signs_out_hypothesis(self, h: Hypothesis) -> List[Sign]:
-        return list(set(self.signs) - set(self.get_signs_in_hypothesis(h)))
+        linked = self.index.hypothesis_links(h)
+        return [s for s in self.signs if s.id not in linked]
 
     def get_links(self, h: Hypothesis) -> List[Tuple[Sign, SignValue]]:
         return [(self.get_sign_by_id(sv.sign_id), sv) for sv in h.signs]
@@ -491,6 +749,11 @@ class KnowledgeBase:
         if self.hypos:
             h.id = self.hypos[-1].id + 1
         self.hypos.append(h)
+        self.index.hypos[h.id] = h
+        if self._search is not None:
+            self._search.hypos.add(h.id, h.name, h.desc)
+        self._on_undo(lambda: self.hypos.remove(h))
+        self._notify('hypos_added', h.id)
         return h
 
     def add_sign(self) -> Sign:
@@ -498,48 +761,119 @@ class KnowledgeBase:
         if self.signs:
             s.id = self.signs[-1].id + 1
         self.signs.append(s)
+        self.index.signs[s.id] = s
+        if self._search is not None:
+            self._search.signs.add(s.id, s.name, s.question)
+        self._on_undo(lambda: self.signs.remove(s))
+        self._notify('sign_added', s.id)
         return s
 
+    def add_link(self, h_id: int, sign_id: int) -> SignValue:
+        h = self.get_hypothesis_by_id(h_id)
+        sv = h.add_sign(self.get_sign_by_id(sign_id))
+        self.index.add_link(h_id, sv)
+        self._on_undo(lambda: h.signs.remove(sv))
+        self._notify('link_added', h_id, sign_id)
+        return sv
+
     def change_sign(self, sign_id: int, name: str, question: str) -> Sign:
         s = self.get_sign_by_id(sign_id)
+        if self._batch is not None:
+            self._on_undo(partial(s.__dict__.update, {'name': s.name, 'question': s.question}))
         s.name = name
         s.question = question
+        if self._search is not None:
+            self._search.signs.update(sign_id, name, question)
+        self._notify('sign_changed', sign_id)
         return s
 
     def change_hypos(self, hypo_id: int, name: str, desc: str, p: str) -> Hypothesis:
         h = self.get_hypothesis_by_id(hypo_id)
+        if self._batch is not None:
+            self._on_undo(partial(h.__dict__.update, {'name': h.name, 'desc': h.desc, '_init_p': h.init_p}))
         h.name = name
         h.desc = desc
         try:
             value = float(p.replace(',', '.'))
             h.init_p = value
         except ValueError:
-            return h
+            pass
+        if self._search is not None:
+            self._search.hypos.update(hypo_id, name, desc)
+        self._notify('hypos_changed', hypo_id)
         return h
 
     def change_link(self, h_id: int, sign_id: int, p_pos: str, p_neg: str):
-        h = self.get_hypothesis_by_id(h_id)
-        sv = h.get_link_by_sign_id(sign_id)
+        sv = self.get_link(h_id, sign_id)
+        if self._batch is not None:
+            self._on_undo(partial(sv.__dict__.update, {'_p_pos': sv.p_pos, '_p_neg': sv.p_neg}))
         sv.p_pos = p_pos
         sv.p_neg = p_neg
+        self._notify('link_changed', h_id, sign_id)
 
     def delete_sign(self, sign_id: int):
-        self.signs.remove(self.get_sign_by_id(sign_id))
-        to_remove = list()
-        for h in self.hypos:
-            for sv in h.signs:
-                if sv.sign_id == sign_id:
-                    to_remove.append(sv)
-            for sv in to_remove:
-                h.signs.remove(sv)
+        index = self.index
+        s = index.signs.pop(sign_id)
+        self._on_undo(partial(self.signs.insert, self.signs.index(s), s))
+        self.signs.remove(s)
+        for h_id, sv in list(index.sign_links(sign_id).items()):
+            signs = index.hypos[h_id].signs
+            self._on_undo(partial(signs.insert, signs.index(sv), sv))
+            signs.remove(sv)
+            index.remove_link(h_id, sign_id)
+        del index.by_sign[sign_id]
+        if self._search is not None:
+            self._search.signs.remove(sign_id)
+        self._notify('sign_deleted', sign_id)
 
     def delete_hypo(self, hypo_id: int):
-        self.hypos.remove(self.get_hypothesis_by_id(hypo_id))
+        index = self.index
+        h = index.hypos.pop(hypo_id)
+        self._on_undo(partial(self.hypos.insert, self.hypos.index(h), h))
+        self.hypos.remove(h)
+        if index.by_sign is not None:
+            for sign_id in index.hypothesis_links(h):
+                index.by_sign[sign_id].pop(hypo_id, None)
+        index.by_hypo.pop(hypo_id, None)
+        if self._search is not None:
+            self._search.hypos.remove(hypo_id)
+        self._notify('hypos_deleted', hypo_id)
 
     def delete_link(self, h_id, sign_id):
-        h = self.get_hypothesis_by_id(h_id)
-        sv = h.get_link_by_sign_id(sign_id)
-        h.signs.remove(sv)
+        sv = self.get_link(h_id, sign_id)
+        signs = self.get_hypothesis_by_id(h_id).signs
+        self._on_undo(partial(signs.insert, signs.index(sv), sv))
+        signs.remove(sv)
+        self.index.remove_link(h_id, sign_id)
+        self._notify('link_deleted', h_id, sign_id)
+
+
+class _ProgressReader:
+    """
+    Файл для json.load поверх потока open_text: read() читает распакованные байты порциями по CHUNK
+    в один bytearray и после каждой вызывает progress(прочитано байт, всего байт); total=0 - размер неизвестен.
+    Байты декодируются и освобождаются до разбора, так что памяти нужно столько же, сколько при чтении потока
+    напрямую. Исключение из progress прерывает чтение (так отменяется фоновая загрузка).
+    """
+
+    # порция чтения между сообщениями о ходе загрузки
+    CHUNK = 2 ** 20
+
+    def __init__(self, file, total: int, progress: Callable[[int, int], None]):
+        self.buffer = file.buffer
+        self.encoding: str = file.encoding
+        self.total = total
+        self.progress = progress
+
+    def read(self) -> str:
+        data = bytearray()
+        while True:
+            chunk = self.buffer.read(self.CHUNK)
+            if not chunk:
+                break
+            data += chunk
+            self.progress(self.buffer.tell() if self.total else 0, self.total)
+        return data.decode(self.encoding)
 
 
 class AppModel:
@@ -552,67 +886,254 @@ class AppModel:
     class Files:
         BASE_DIR = './data/'
         BASE_PATH = Path(BASE_DIR).resolve()
-        BASE_PATH.mkdir(parents=True, exist_ok=True)
         SUFFIX = '.kb.json'
+        SQLITE_SUFFIX = '.kb.sqlite'
+        # .kb.json.gz, .kb.json.xz и .kb.json.zst (если установлен zstandard)
+        COMPRESSED_SUFFIXES = tuple('.kb.json' + s for s in OPENERS)
+        SUFFIXES = (SUFFIX, SQLITE_SUFFIX) + COMPRESSED_SUFFIXES
+        # символы, недопустимые в имени базы (оно же имя файла)
+        FORBIDDEN_CHARS = '/\\:*?"<>|'
 
         @classmethod
-        def create_path(cls, name) -> Path:
-            return cls.BASE_PATH / (name + cls.SUFFIX)
+        def create_path(cls, name, suffix: Optional[str] = None) -> Path:
+            return cls.BASE_PATH / (name + (suffix or cls.SUFFIX))
+
+        @classmethod
+        def suffix_of(cls, path: Path) -> str:
+            for suffix in cls.SUFFIXES:
+                if path.name.endswith(suffix):
+                    return suffix
+            return cls.SUFFIX
+
+        @classmethod
+        def is_sqlite(cls, path: Path) -> bool:
+            return path.name.endswith(cls.SQLITE_SUFFIX)
 
         @classmethod
         def get_file_list(cls) -> List[Path]:
             # print(cls.BASE_PATH)
-            return list(cls.BASE_PATH.glob(f'*{cls.SUFFIX}'))
+            return [p for suffix in cls.SUFFIXES for p in cls.BASE_PATH.glob(f'*{suffix}')]
+
+    # оценка памяти, которую могут занимать загруженные базы
+    CACHE_BYTES = 256 * 2 ** 20
 
     def __init__(self):
-        self.bases: List[KnowledgeBase] = list()
+        # каталог создаётся при создании модели, а не при импорте модуля
+        self.Files.BASE_PATH.mkdir(parents=True, exist_ok=True)
+        self.bases = BaseCache(self.read_base, self.CACHE_BYTES)
         self.manual_files: Set[Path] = set()
+        self.catalog = Catalog(self.Files.BASE_PATH, self.Files.SUFFIXES)
 
     def __repr__(self):
         bases_str = '/n'.join([b.__repr__() for b in self.bases])
         return f"AppModel({bases_str})"
 
     def get_file_list(self) -> Set[Path]:
-        return self.manual_files.union(set(self.Files.get_file_list()))
+        return self.manual_files.union(set(self.catalog.get_file_list()))
+
+    def get_file_entries(self) -> List[Tuple[Path, Optional[CatalogEntry]]]:
+        """Файлы баз вместе с данными из каталога (CatalogEntry или None, если файл не читается)."""
+        entries = [(p, self.catalog.get_entry(p)) for p in sorted(self.get_file_list())]
+        self.catalog.save()
+        return entries
+
+    def apply_file_event(self, event: str, name: str, new_name: str = '') -> Tuple[Path, Optional[CatalogEntry]]:
+        """Обновляет каталог по событию DirectoryWatcher; возвращает актуальный путь и данные о файле."""
+        self.catalog.apply_event(event, name, new_name)
+        path = self.Files.BASE_PATH / (new_name or name)
+        entry = None if event == 'removed' else self.catalog.get_entry(path)
+        self.catalog.save()
+        return path, entry
 
     def find_file(self, name: str) -> Path:
-        file_name = name + self.Files.SUFFIX
+        file_names = [name + suffix for suffix in self.Files.SUFFIXES]
         for p in self.get_file_list():
-            if p.name == file_name:
+            if p.name in file_names:
                 return p
 
     def add_manual_paths(self, files: List[Path]):
         self.manual_files = set(self.manual_files).union(set(files))
 
     def rename_base(self, base: KnowledgeBase, name: str):
-        old_path = self.Files.create_path(base.name)
-        new_path = self.Files.create_path(name)
-        base.name = name
-        old_path.rename(new_path)
-        self.save_base(base)
-
-    def add_base(self):
+        """
+        Переименовывает базу и её файл одной операцией. Имя уже занятого файла не перезаписывается:
+        FileExistsError; недопустимое имя - ValueError. При ошибке база и файл остаются прежними.
+        SQLite: файл переименовывается, затем имя обновляется в таблице meta; если это не удалось,
+        файл возвращается на место. Ленивые поля дальше читаются из переименованного файла.
+        JSON: база пишется во временный файл, который атомарно становится новым файлом, прежний удаляется.
+        """
+        name = name.strip()
+        if name == base.name:
+            return
+        if not name or any(c in self.Files.FORBIDDEN_CHARS for c in name):
+            raise ValueError(f'Недопустимое имя базы знаний: "{name}"')
+        suffix = self.Files.suffix_of(base.last_path)
+        old_path = self.Files.create_path(base.name, suffix)
+        new_path = self.Files.create_path(name, suffix)
+        # имя занято, если есть файл базы с этим именем в любом формате
+        taken = (self.Files.create_path(name, s) for s in self.Files.SUFFIXES)
+        if any(p.exists() and not (old_path.exists() and p.samefile(old_path)) for p in taken):
+            raise FileExistsError(f'База знаний "{name}" уже существует')
+        old_name = base.name
+        if base._storage is not None:
+            from source.storage import SqliteStorage
+            base._storage.save(base)
+            base._storage.close()
+            try:
+                os.replace(old_path, new_path)
+            except OSError:
+                SqliteStorage(old_path).attach(base)
+                raise
+            storage = None
+            try:
+                storage = SqliteStorage(new_path)
+                storage.rename(name)
+                storage.connection.commit()
+            except Exception:
+                if storage is not None:
+                    storage.close()
+                os.replace(new_path, old_path)
+                SqliteStorage(old_path).attach(base)
+                raise
+            base.name = name
+            base.last_path = new_path
+            storage.attach(base)
+        else:
+            tmp_path = new_path.with_name(new_path.name + '.tmp')
+            base.name = name
+            try:
+                self.write_json(base, tmp_path, suffix)
+                os.replace(tmp_path, new_path)
+            except OSError:
+                base.name = old_name
+                tmp_path.unlink(missing_ok=True)
+                raise
+            base.last_path = new_path
+            if old_path != new_path:
+                old_path.unlink(missing_ok=True)
+        self.bases.rekey(base, new_path)
+
+    def add_base(self, suffix: Optional[str] = None):
         kb = KnowledgeBase()
-        self.bases.append(kb)
+        if suffix:
+            kb.last_path = self.Files.create_path(kb.name, suffix)
+        AppModel.save_base(kb)
+        self.bases.put(kb)
+
+    def import_base(self, directory: Path) -> KnowledgeBase:
+        """
+        Создаёт базу из таблиц CSV/TSV каталога (см. source.exchange); имя базы - имя каталога.
+        Если база с таким именем уже есть в любом формате, она не перезаписывается: FileExistsError.
+        """
+        from source.exchange import import_csv
+        name = directory.name
+        if self.find_file(name) is not None or any(self.Files.create_path(name, s).exists()
+                                                   for s in self.Files.SUFFIXES):
+            raise FileExistsError(f'База знаний "{name}" уже существует')
+        kb = import_csv(directory)
         AppModel.save_base(kb)
+        self.bases.put(kb)
+        return kb
+
+    @staticmethod
+    def export_base(base: KnowledgeBase, directory: Path, delimiter: str = ','):
+        from source.exchange import export_csv
+        export_csv(base, directory, delimiter)
+
+    def convert_base(self, base: KnowledgeBase, suffix: str):
+        """
+        Пересохраняет базу в другом формате (например, сжатом) и удаляет прежний файл.
+        Новый файл пишется во временный рядом и получает своё имя, только когда записан целиком.
+        """
+        old_path = base.last_path
+        new_path = self.Files.create_path(base.name, suffix)
+        if new_path == old_path:
+            AppModel.save_base(base)
+            return
+        tmp_path = new_path.with_name(new_path.name + '.tmp')
+        # ленивые поля читаются из прежнего файла, поэтому загружаются до его закрытия
+        base.load_all()
+        try:
+            if self.Files.is_sqlite(new_path):
+                from source.storage import SqliteStorage
+                storage = SqliteStorage(tmp_path)
+                try:
+                    storage.write_all(base)
+                    storage.connection.commit()
+                finally:
+                    storage.close()
+            else:
+                self.write_json(base, tmp_path, suffix)
+            os.replace(tmp_path, new_path)
+        except Exception:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        if base._storage is not None:
+            base._storage.close()
+        base.last_path = new_path
+        if self.Files.is_sqlite(new_path):
+            from source.storage import SqliteStorage
+            SqliteStorage(new_path).attach(base)
+        old_path.unlink()
+        self.bases.rekey(base, new_path)
 
     @staticmethod
     def save_base(base: KnowledgeBase):
-        path = AppModel.Files.create_path(base.name)  # self.BASE_DIR + base.name + '.kb.json'
+        suffix = AppModel.Files.suffix_of(base.last_path)
+        path = AppModel.Files.create_path(base.name, suffix)  # self.BASE_DIR + base.name + '.kb.json'
         base.last_path = path
-        with path.open('w') as file:
-            json.dump({f'__{base.__class__.__name__}__': base.__dict__}, file, indent=4, cls=AppModel.JSON.ENCODER)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if AppModel.Files.is_sqlite(path):
+            from source.storage import SqliteStorage
+            storage = base._storage if base._storage is not None else SqliteStorage(path)
+            storage.save(base)
+            return
+        AppModel.write_json(base, path)
+
+    @staticmethod
+    def write_json(base: KnowledgeBase, path: Path, suffix: Optional[str] = None):
+        """Пишет базу в JSON; suffix - суффикс формата (например, '.kb.json.gz'), если это временный файл."""
+        file_format = Path(suffix or path.name).suffix
+        # сжатые файлы пишутся без отступов: их всё равно не читают глазами
+        indent = None if file_format in OPENERS else 4
+        with open_text(path, 'w', file_format) as file:
+            json.dump({f'__{_type_name(base)}__': _state(base)}, file, indent=indent, cls=AppModel.JSON.ENCODER)
+
+    def load_base(self, path: Path, lazy: bool = False, pin: bool = False) -> KnowledgeBase:
+        """
+        База из кэша или с диска. Занятая (pin=True) база не вытесняется из кэша,
+        пока не будет вызван release_base.
+        """
+        return self.bases.get(path, lazy, pin)
+
+    def cached_base(self, path: Path, pin: bool = False) -> Optional[KnowledgeBase]:
+        """База из кэша, если она там есть и файл не менялся; иначе None, без чтения с диска."""
+        return self.bases.lookup(path, pin)
+
+    def add_loaded_base(self, base: KnowledgeBase, pin: bool = False):
+        """Кладёт в кэш базу, прочитанную read_base (например, в фоновом потоке)."""
+        self.bases.put(base, pin)
 
-    def load_base(self, path: Path) -> int:
-        for index, item in enumerate(self.bases):
-            if item.last_path.name == path.name:
-                return index
+    def release_base(self, base: KnowledgeBase):
+        self.bases.release(base)
 
-        with path.open('r') as file:
-            data: KnowledgeBase = json.load(file, object_hook=self.JSON.DECODER)
+    def read_base(self, path: Path, lazy: bool = False,
+                  progress: Optional[Callable[[int, int], None]] = None) -> KnowledgeBase:
+        """
+        Читает базу с диска в обход кэша; можно вызывать из фонового потока.
+        lazy=True читает только заголовок базы SQLite; JSON всё равно разбирается целиком, поэтому читается полностью.
+        progress(прочитано, всего) вызывается по мере чтения JSON, для сжатых файлов всего = 0.
+        """
+        if self.Files.is_sqlite(path):
+            from source.storage import SqliteStorage
+            data = SqliteStorage(path).load(lazy)
+        else:
+            with open_text(path, 'r') as file:
+                if progress is not None:
+                    file = _ProgressReader(file, 0 if is_compressed(path) else path.stat().st_size, progress)
+                data: KnowledgeBase = json.load(file, object_hook=self.JSON.DECODER)
         data.last_path = path
-        self.bases.append(data)
-        return len(self.bases) - 1
+        return data
 
 
 if __name__ == '__main__':
@@ -656,13 +1177,11 @@ if __name__ == '__main__':
     #     print(d)
 
     app = AppModel()
-    app.bases.append(kb)
     print(app)
-    print(app.bases[0].last_path)
     app.save_base(kb)
-    print(app.bases[0].last_path)
+    print(kb.last_path)
     # p = Path('../data/test_data.kb.json').resolve()
     c = app.load_base(Path(kb.last_path))
     print(c)
     print(app)
-    print(app.bases[0].last_path)
+    print(c.last_path)
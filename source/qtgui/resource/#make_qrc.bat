@@ -1,3 +1,4 @@
 .\..\..\..\venv\Scripts\pyrcc5 -o .\..\..\application_rc.py application.qrc
+rcc -binary -o application.rcc application.qrc
 
 pause>nul
\ No newline at end of file
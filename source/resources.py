@@ -0,0 +1,29 @@
+# *- coding: utf-8 -*-
+from pathlib import Path
+
+from PyQt5.QtCore import QResource
+from PyQt5.QtGui import QIcon
+
+# ресурсы application.qrc, собранные rcc -binary (см. qtgui/resource/#make_qrc.bat)
+RCC_PATH = Path(__file__).parent / 'qtgui' / 'resource' / 'application.rcc'
+
+_loaded = False
+
+
+def load_resources():
+    """
+    Регистрирует ресурсы приложения (иконки из application.qrc) при первом обращении к иконке.
+    Файл .rcc Qt отображает в память, не копируя; модуль source.application_rc со встроенными данными
+    импортируется, только если файла нет рядом (например, в сборке, куда его не положили).
+    """
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    if not QResource.registerResource(str(RCC_PATH)):
+        import source.application_rc  # noqa: F401 - ресурсы регистрируются при импорте
+
+
+def icon(name: str) -> QIcon:
+    load_resources()
+    return QIcon(':/icons/' + name)
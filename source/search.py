@@ -0,0 +1,85 @@
+# *- coding: utf-8 -*-
+from typing import TYPE_CHECKING, Dict, Optional, Set
+
+if TYPE_CHECKING:
+    from source.model import KnowledgeBase
+
+
+def normalize(text: str) -> str:
+    """Нижний регистр, ё -> е, пробелы схлопнуты: по этой форме и индексируется, и ищется."""
+    return ' '.join(text.casefold().replace('ё', 'е').split())
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """
+    Инвертированный индекс по триграммам: триграмма -> id объектов, в тексте которых она встречается.
+    Поиск пересекает списки триграмм каждого слова запроса и проверяет кандидатов подстрокой,
+    слова короче трёх символов проверяются перебором кандидатов.
+    """
+
+    def __init__(self):
+        self.texts: Dict[int, str] = dict()
+        self.postings: Dict[str, Set[int]] = dict()
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def add(self, item_id: int, *fields: str):
+        text = normalize('\n'.join(fields))
+        self.texts[item_id] = text
+        for gram in trigrams(text):
+            self.postings.setdefault(gram, set()).add(item_id)
+
+    def remove(self, item_id: int):
+        text = self.texts.pop(item_id, None)
+        if text is None:
+            return
+        for gram in trigrams(text):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(item_id)
+                if not ids:
+                    del self.postings[gram]
+
+    def update(self, item_id: int, *fields: str):
+        self.remove(item_id)
+        self.add(item_id, *fields)
+
+    def find(self, query: str) -> Set[int]:
+        """id объектов, в тексте которых есть каждое слово запроса; пустой запрос находит всё."""
+        words = normalize(query).split()
+        candidates: Optional[Set[int]] = None
+        for word in sorted(words, key=len, reverse=True):
+            if len(word) < 3:
+                break
+            for gram in trigrams(word):
+                ids = self.postings.get(gram, set())
+                candidates = set(ids) if candidates is None else candidates & ids
+                if not candidates:
+                    return set()
+        if candidates is None:
+            candidates = set(self.texts)
+        return {item_id for item_id in candidates if all(word in self.texts[item_id] for word in words)}
+
+    def matches(self, item_id: int, query: str) -> bool:
+        text = self.texts.get(item_id)
+        return text is not None and all(word in text for word in normalize(query).split())
+
+
+class SearchIndex:
+    """
+    Полнотекстовый поиск по базе: признаки - по названию и вопросу, гипотезы - по названию и описанию.
+    Строится при первом поиске и дальше поддерживается методами KnowledgeBase, как и индекс связей.
+    """
+
+    def __init__(self, kb: 'KnowledgeBase'):
+        self.signs = TrigramIndex()
+        self.hypos = TrigramIndex()
+        for s in kb.signs:
+            self.signs.add(s.id, s.name, s.question)
+        for h in kb.hypos:
+            self.hypos.add(h.id, h.name, h.desc)
@@ -0,0 +1,375 @@
+# *- coding: utf-8 -*-
+"""
+HTTP/JSON-сервис опроса по базам знаний на asyncio, без GUI.
+Базы загружаются при запуске и компилируются (CompiledBase) один раз; сеансы - Consultation по общей базе.
+
+    GET    /bases                       загруженные базы
+    POST   /sessions  {"base": имя}     новый сеанс, первый вопрос
+    GET    /sessions/<id>               текущий вопрос
+    POST   /sessions/<id>/answer  {"answer": 0..4}
+    GET    /sessions/<id>/result        гипотезы по убыванию P
+    DELETE /sessions/<id>
+    GET    /stats                       сеансы и память хранилища и кэша состояний
+
+Сеансы хранятся в SessionStore компактными blob с TTL и вытеснением на диск (--spill).
+Состояния после одинаковых последовательностей ответов общие для всех сеансов процесса (StateCache,
+--state-cache МБ, 0 - без кэша): популярные первые шаги не пересчитываются.
+С --workers N базы компилируются один раз и кладутся в разделяемую память, а N процессов подключают их
+только для чтения и слушают один порт (SO_REUSEPORT); это требует --stateless. С --compiled КАТАЛОГ
+скомпилированные базы сохраняются образами .kbc и при следующем запуске отображаются в память без разбора.
+С --stateless сеанс целиком передаётся клиенту подписанным токеном (SessionTokens), который и служит <id>:
+каждый ответ возвращает новый токен, и его может обработать любой процесс с тем же секретом (--secret
+или переменная окружения KB_SESSION_SECRET).
+Запуск: python -m source.service [--host 127.0.0.1] [--port 8080] [--ttl 3600] [--max-memory 256] [--spill файл]
+        [--stateless [--posterior]] [--workers N] [--compiled каталог] [--state-cache 64] [файлы баз...]
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import secrets
+import signal
+import socket
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from source.engine import CompiledBase, Consultation, StateCache
+from source.model import ANSWER_WEIGHTS, AppModel
+from source.sessions import SessionStore
+from source.tokens import SessionTokens, TokenError
+
+REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class ServiceError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status: int = status
+
+
+class ConsultationService:
+    """
+    Сеансы опроса; между запросами сеанс лежит в SessionStore в виде blob (Consultation.to_bytes)
+    либо, если заданы tokens, у клиента в виде токена. Методы возвращают готовые к JSON словари.
+    """
+
+    def __init__(self, bases: List[CompiledBase], store: Optional[SessionStore] = None,
+                 tokens: Optional[SessionTokens] = None, cache: Optional[StateCache] = None):
+        self.bases: Dict[str, CompiledBase] = {base.name: base for base in bases}
+        self.bases_by_key: Dict[bytes, CompiledBase] = {base.key: base for base in bases}
+        self.store: SessionStore = store if store is not None else SessionStore()
+        self.tokens: Optional[SessionTokens] = tokens
+        self.cache: Optional[StateCache] = cache
+
+    def save_session(self, session_id: Optional[str], session: Consultation) -> str:
+        """Сохраняет сеанс и возвращает его id: прежний (или новый) ключ хранилища либо новый токен."""
+        if self.tokens is not None:
+            return self.tokens.encode(session)
+        session_id = session_id or secrets.token_urlsafe(12)
+        self.store.put(session_id, session.to_bytes())
+        return session_id
+
+    def get_session(self, session_id: str) -> Consultation:
+        if self.tokens is not None:
+            try:
+                return self.tokens.decode(session_id)
+            except TokenError as error:
+                raise ServiceError(404, f'Сеанс не восстановлен: {error}')
+        try:
+            blob = self.store.get(session_id)
+        except KeyError:
+            raise ServiceError(404, f'Сеанс {session_id} не найден или истёк')
+        base = self.bases_by_key.get(Consultation.base_key(blob))
+        if base is None:
+            raise ServiceError(404, f'База сеанса {session_id} больше не загружена')
+        return Consultation.from_bytes(base, blob, self.cache)
+
+    def list_bases(self) -> dict:
+        return {'bases': [{'name': b.name, 'fingerprint': b.fingerprint,
+                           'hypos': len(b.hypo_ids), 'signs': len(b.sign_ids)} for b in self.bases.values()]}
+
+    def start(self, base_name: Any) -> dict:
+        base = self.bases.get(base_name)
+        if base is None:
+            raise ServiceError(404, f'База {base_name} не загружена')
+        try:
+            session = Consultation(base, self.cache)
+        except ValueError as error:
+            raise ServiceError(400, str(error))
+        return self.state(self.save_session(None, session), session)
+
+    def state(self, session_id: str, session: Optional[Consultation] = None) -> dict:
+        session = session or self.get_session(session_id)
+        base = session.base
+        question = None
+        if not session.stop:
+            question = {'id': base.sign_ids[session.current], 'name': base.sign_names[session.current],
+                        'text': base.questions[session.current]}
+        return {'session': session_id, 'base': base.name, 'step': len(session.answers),
+                'stop': session.stop, 'question': question}
+
+    def answer(self, session_id: str, answer: Any) -> dict:
+        session = self.get_session(session_id)
+        if session.stop:
+            raise ServiceError(400, 'Расчёт уже завершён')
+        if not isinstance(answer, int) or isinstance(answer, bool) or answer not in ANSWER_WEIGHTS:
+            raise ServiceError(400, f'Ответ должен быть одним из {sorted(ANSWER_WEIGHTS)}')
+        session.answer(answer)
+        return self.state(self.save_session(session_id, session), session)
+
+    def result(self, session_id: str) -> dict:
+        session = self.get_session(session_id)
+        base = session.base
+        hypos = [{'id': base.hypo_ids[h], 'name': base.hypo_names[h], 'desc': base.hypo_descs[h],
+                  'p': session.p[h], 'p_min': session.p_min[h], 'p_max': session.p_max[h]}
+                 for h in session.ranking()]
+        return {'session': session_id, 'stop': session.stop, 'best': hypos[0], 'hypotheses': hypos}
+
+    def close(self, session_id: str) -> dict:
+        self.get_session(session_id)
+        if self.tokens is None:
+            self.store.delete(session_id)
+        return {'session': session_id, 'deleted': True}
+
+    def route(self, method: str, path: str, body: bytes) -> Tuple[int, dict]:
+        parts = [part for part in path.split('/') if part]
+        data = self.parse_body(body) if method == 'POST' else dict()
+        if parts == ['bases']:
+            self.check_method(method, 'GET')
+            return 200, self.list_bases()
+        if parts == ['stats']:
+            self.check_method(method, 'GET')
+            report = self.store.report()
+            if self.cache is not None:
+                report['states'] = self.cache.report()
+            return 200, report
+        if parts == ['sessions']:
+            self.check_method(method, 'POST')
+            return 201, self.start(data.get('base'))
+        if len(parts) == 2 and parts[0] == 'sessions':
+            self.check_method(method, 'GET', 'DELETE')
+            return 200, self.state(parts[1]) if method == 'GET' else self.close(parts[1])
+        if len(parts) == 3 and parts[0] == 'sessions' and parts[2] == 'answer':
+            self.check_method(method, 'POST')
+            return 200, self.answer(parts[1], data.get('answer'))
+        if len(parts) == 3 and parts[0] == 'sessions' and parts[2] == 'result':
+            self.check_method(method, 'GET')
+            return 200, self.result(parts[1])
+        raise ServiceError(404, f'Нет ресурса {path}')
+
+    @staticmethod
+    def check_method(method: str, *allowed: str):
+        if method not in allowed:
+            raise ServiceError(405, f'Метод {method} не поддерживается, допустимы: {", ".join(allowed)}')
+
+    @staticmethod
+    def parse_body(body: bytes) -> dict:
+        try:
+            data = json.loads(body.decode('utf-8')) if body else dict()
+        except ValueError as error:
+            raise ServiceError(400, f'Неверный JSON: {error}')
+        if not isinstance(data, dict):
+            raise ServiceError(400, 'Тело запроса должно быть JSON-объектом')
+        return data
+
+
+class HttpServer:
+    """
+    Минимальный HTTP/1.1 поверх asyncio.start_server: тело по Content-Length, keep-alive, ответы в JSON.
+    Запросы одного соединения обрабатываются по очереди, соединения - конкурентно в одном потоке.
+    """
+
+    MAX_BODY = 64 * 1024
+    MAX_HEADERS = 100
+
+    def __init__(self, service: ConsultationService):
+        self.service = service
+
+    async def serve(self, host: str, port: int, reuse_port: bool = False):
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024, reuse_port=reuse_port or None)
+        print(f'Сервис опроса: http://{host}:{port}, баз: {len(self.service.bases)}, процесс {os.getpid()}',
+              file=sys.stderr)
+        expiry = asyncio.ensure_future(self.expire_sessions())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            expiry.cancel()
+            self.service.store.close()
+
+    async def expire_sessions(self):
+        store = self.service.store
+        while True:
+            await asyncio.sleep(min(store.ttl / 10, 60))
+            store.expire()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+                method, path, body, keep_alive = request
+                try:
+                    status, payload = self.service.route(method, path, body)
+                except ServiceError as error:
+                    status, payload = error.status, {'error': str(error)}
+                except Exception as error:
+                    status, payload = 500, {'error': f'{error.__class__.__name__}: {error}'}
+                self.write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except ServiceError as error:
+            self.write_response(writer, error.status, {'error': str(error)}, False)
+        finally:
+            writer.close()
+
+    async def read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, bytes, bool]]:
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        try:
+            method, target, version = line.decode('latin-1').split()
+        except ValueError:
+            raise ServiceError(400, 'Неверная строка запроса')
+        headers: Dict[str, str] = dict()
+        for _ in range(self.MAX_HEADERS):
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise ServiceError(400, 'Неверный Content-Length')
+        if length > self.MAX_BODY:
+            raise ServiceError(413, f'Тело запроса больше {self.MAX_BODY} байт')
+        body = await reader.readexactly(length) if length > 0 else b''
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+        return method.upper(), target.split('?', 1)[0], body, keep_alive
+
+    @staticmethod
+    def write_response(writer: asyncio.StreamWriter, status: int, payload: dict, keep_alive: bool):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = (f'HTTP/1.1 {status} {REASONS.get(status, "")}\r\n'
+                f'Content-Type: application/json; charset=utf-8\r\n'
+                f'Content-Length: {len(data)}\r\n'
+                f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+        writer.write(head.encode('latin-1') + data)
+
+
+def load_bases(paths: List[Path], compiled_dir: Optional[Path] = None) -> List[CompiledBase]:
+    """
+    Компилирует базы из файлов. С compiled_dir образ базы берётся из <compiled_dir>/<файл>.kbc, если он новее
+    файла базы, иначе база разбирается и образ сохраняется для следующего запуска.
+    """
+    app_model = AppModel()
+    bases = list()
+    for path in paths:
+        image = compiled_dir / f'{path.name}.kbc' if compiled_dir is not None else None
+        try:
+            if image is not None and image.exists() and image.stat().st_mtime >= path.stat().st_mtime:
+                try:
+                    bases.append(CompiledBase.open(image))
+                    continue
+                except ValueError as error:
+                    print(f'{image.name}: {error}, база будет скомпилирована заново', file=sys.stderr)
+            base = CompiledBase(app_model.read_base(path))
+            if image is not None:
+                compiled_dir.mkdir(parents=True, exist_ok=True)
+                base.save(image)
+            bases.append(base)
+        except (OSError, ValueError) as error:
+            print(f'{path.name}: {error}', file=sys.stderr)
+    return bases
+
+
+def make_service(bases: List[CompiledBase], args) -> ConsultationService:
+    store = SessionStore(args.ttl, args.max_memory * 2 ** 20, args.spill)
+    cache = StateCache(args.state_cache * 2 ** 20) if args.state_cache > 0 else None
+    tokens = None
+    if args.stateless:
+        tokens = SessionTokens(args.secret.encode('utf-8'), bases, args.ttl, args.posterior, cache)
+    return ConsultationService(bases, store, tokens, cache)
+
+
+def serve_worker(block_names: List[str], args):
+    """Процесс-обработчик: подключает базы из разделяемой памяти и слушает общий порт."""
+    bases = [CompiledBase.attach(name) for name in block_names]
+    try:
+        asyncio.run(HttpServer(make_service(bases, args)).serve(args.host, args.port, reuse_port=True))
+    except KeyboardInterrupt:
+        pass
+
+
+def serve_workers(bases: List[CompiledBase], args):
+    """Кладёт базы в разделяемую память, запускает args.workers обработчиков и ждёт их; блоки удаляет сам."""
+    blocks = [base.share() for base in bases]
+    workers = [multiprocessing.Process(target=serve_worker, args=([block.name for block in blocks], args))
+               for _ in range(args.workers)]
+    # SIGTERM, как и Ctrl+C, останавливает обработчики и удаляет блоки
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='HTTP/JSON-сервис опроса по базам знаний')
+    parser.add_argument('paths', nargs='*', type=Path,
+                        help=f'файлы баз (по умолчанию все из {AppModel.Files.BASE_DIR})')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--ttl', type=float, default=3600, help='время жизни неактивного сеанса, с')
+    parser.add_argument('--max-memory', type=int, default=256, help='память под сеансы, МБ')
+    parser.add_argument('--spill', type=Path, help='файл SQLite для сеансов, не поместившихся в память')
+    parser.add_argument('--stateless', action='store_true', help='сеансы в подписанных токенах у клиента')
+    parser.add_argument('--posterior', action='store_true',
+                        help='писать в токен и вероятности: токен длиннее, зато без повтора ответов')
+    parser.add_argument('--secret', default=os.environ.get('KB_SESSION_SECRET'),
+                        help='ключ подписи токенов, общий для всех процессов')
+    parser.add_argument('--workers', type=int, default=1, help='процессов-обработчиков с общими базами')
+    parser.add_argument('--compiled', type=Path, help='каталог образов скомпилированных баз (.kbc)')
+    parser.add_argument('--state-cache', type=int, default=64, help='память под общие состояния сеансов, МБ')
+    args = parser.parse_args(argv)
+    if args.workers > 1 and not args.stateless:
+        parser.error('--workers больше 1 требует --stateless: у процессов нет общего хранилища сеансов')
+    if args.workers > 1 and not hasattr(socket, 'SO_REUSEPORT'):
+        parser.error('--workers больше 1 требует SO_REUSEPORT, которого нет на этой платформе')
+    bases = load_bases(args.paths or sorted(AppModel.Files.get_file_list()), args.compiled)
+    if not bases:
+        parser.error('нет ни одной загруженной базы')
+    if args.stateless and not args.secret:
+        print('Ключ подписи не задан: токены будут действительны только до перезапуска', file=sys.stderr)
+        args.secret = secrets.token_urlsafe(32)
+    if args.workers > 1:
+        serve_workers(bases, args)
+        return
+    try:
+        asyncio.run(HttpServer(make_service(bases, args)).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
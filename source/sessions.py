@@ -0,0 +1,154 @@
+# *- coding: utf-8 -*-
+import sqlite3
+import struct
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# время последнего обращения перед blob сеанса в памяти
+_TOUCHED = struct.Struct('<d')
+
+# файл выгрузки - продолжение памяти процесса, а не долговременное хранилище: без fsync и журнала на диске
+_SCHEMA = """
+PRAGMA synchronous = OFF;
+PRAGMA journal_mode = MEMORY;
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    touched REAL NOT NULL,
+    blob BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_by_touched ON sessions (touched);
+"""
+
+
+class SessionStore:
+    """
+    Сеансы расчёта как компактные blob (Consultation.to_bytes) по id сеанса.
+    В памяти - OrderedDict в порядке обращений (LRU), как BaseCache; время обращения хранится в первых 8 байтах
+    значения, поэтому порядок LRU совпадает с порядком истечения TTL и просроченные сеансы снимаются с начала.
+    Память считается по размеру ключей и значений плюс ENTRY_OVERHEAD на запись. При превышении max_bytes
+    давние сеансы уходят в SQLite-файл spill_path (если задан) или удаляются; сеанс с диска при обращении
+    возвращается в память.
+    """
+
+    # накладные расходы словаря, узла порядка и объектов ключа и значения на одну запись (оценка)
+    ENTRY_OVERHEAD = 200
+    # при переполнении память освобождается с запасом, чтобы не выгружать по одной записи на каждый put
+    SPILL_RATIO = 0.9
+
+    def __init__(self, ttl: float = 3600, max_bytes: int = 256 * 2 ** 20, spill_path: Optional[Path] = None):
+        self.ttl: float = ttl
+        self.max_bytes: int = max_bytes
+        self.items: 'OrderedDict[str, bytearray]' = OrderedDict()
+        self.total: int = 0
+        self.stats: Dict[str, int] = {'expired': 0, 'evicted': 0, 'spilled': 0, 'restored': 0}
+        self.connection: Optional[sqlite3.Connection] = None
+        if spill_path is not None:
+            self.connection = sqlite3.connect(str(spill_path))
+            self.connection.executescript(_SCHEMA)
+
+    def __len__(self) -> int:
+        return len(self.items) + self.spilled_count()
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self.items or self._read_spilled(session_id) is not None
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def _size(self, session_id: str, value: bytearray) -> int:
+        return len(session_id) + len(value) + self.ENTRY_OVERHEAD
+
+    def get(self, session_id: str) -> bytes:
+        """blob сеанса; KeyError, если сеанса нет или он просрочен. Обращение продлевает TTL."""
+        now = time.time()
+        value = self.items.get(session_id)
+        if value is not None:
+            if _TOUCHED.unpack_from(value)[0] < now - self.ttl:
+                self.delete(session_id)
+                self.stats['expired'] += 1
+                raise KeyError(session_id)
+            _TOUCHED.pack_into(value, 0, now)
+            self.items.move_to_end(session_id)
+            return bytes(value[_TOUCHED.size:])
+        row = self._read_spilled(session_id)
+        if row is None:
+            raise KeyError(session_id)
+        touched, blob = row
+        self.connection.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+        self.connection.commit()
+        if touched < now - self.ttl:
+            self.stats['expired'] += 1
+            raise KeyError(session_id)
+        self.stats['restored'] += 1
+        self.put(session_id, blob)
+        return blob
+
+    def put(self, session_id: str, blob: bytes):
+        value = bytearray(_TOUCHED.pack(time.time()))
+        value += blob
+        old = self.items.pop(session_id, None)
+        if old is not None:
+            self.total -= self._size(session_id, old)
+        self.items[session_id] = value
+        self.total += self._size(session_id, value)
+        if self.total > self.max_bytes:
+            self.shrink()
+
+    def delete(self, session_id: str):
+        value = self.items.pop(session_id, None)
+        if value is not None:
+            self.total -= self._size(session_id, value)
+        elif self.connection is not None:
+            self.connection.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+            self.connection.commit()
+
+    def expire(self) -> int:
+        """Удаляет просроченные сеансы из памяти и с диска; возвращает их число."""
+        cutoff = time.time() - self.ttl
+        count = 0
+        while self.items:
+            session_id, value = next(iter(self.items.items()))
+            if _TOUCHED.unpack_from(value)[0] >= cutoff:
+                break
+            self.items.popitem(last=False)
+            self.total -= self._size(session_id, value)
+            count += 1
+        if self.connection is not None:
+            count += self.connection.execute('DELETE FROM sessions WHERE touched < ?', (cutoff,)).rowcount
+            self.connection.commit()
+        self.stats['expired'] += count
+        return count
+
+    def shrink(self):
+        """Выгружает на диск (или удаляет) давние сеансы, пока память не опустится до SPILL_RATIO * max_bytes."""
+        target = self.max_bytes * self.SPILL_RATIO
+        rows: List[tuple] = list()
+        while self.items and self.total > target:
+            session_id, value = self.items.popitem(last=False)
+            self.total -= self._size(session_id, value)
+            rows.append((session_id, _TOUCHED.unpack_from(value)[0], bytes(value[_TOUCHED.size:])))
+        if self.connection is None:
+            self.stats['evicted'] += len(rows)
+            return
+        self.connection.executemany('INSERT OR REPLACE INTO sessions VALUES (?, ?, ?)', rows)
+        self.connection.commit()
+        self.stats['spilled'] += len(rows)
+
+    def _read_spilled(self, session_id: str) -> Optional[tuple]:
+        if self.connection is None:
+            return None
+        return self.connection.execute('SELECT touched, blob FROM sessions WHERE session_id = ?',
+                                       (session_id,)).fetchone()
+
+    def spilled_count(self) -> int:
+        if self.connection is None:
+            return 0
+        return self.connection.execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+
+    def report(self) -> dict:
+        return dict(self.stats, sessions=len(self.items), spilled_sessions=self.spilled_count(),
+                    bytes=self.total, max_bytes=self.max_bytes)
@@ -0,0 +1,83 @@
+# *- coding: utf-8 -*-
+import getpass
+import json
+import os
+import re
+from typing import List, Optional
+
+from PyQt5.QtCore import QDir, QLockFile, QObject, QThread, pyqtSignal
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+
+
+class SingleInstance(QObject):
+    """
+    Один экземпляр приложения на пользователя. Первый запуск захватывает файл блокировки (QLockFile)
+    и слушает локальный сокет (QLocalServer: сокет Unix или именованный канал Windows).
+    Следующий запуск блокировку не получает: передаёт пути к базам работающему экземпляру и завершается,
+    не создавая окна. Блокировку аварийно завершившегося процесса QLockFile снимает сам, проверив его PID.
+    Сообщение - JSON-список путей одной строкой.
+    """
+    paths_received = pyqtSignal(list)
+
+    TIMEOUT_MS = 1000
+    # первый экземпляр мог уже захватить блокировку, но ещё не начать слушать сокет
+    FORWARD_ATTEMPTS = 10
+    RETRY_DELAY_MS = 200
+
+    def __init__(self, app_name: str):
+        super().__init__()
+        self.key: str = re.sub(r'\W+', '-', f'{app_name}-{getpass.getuser()}')
+        self.lock = QLockFile(os.path.join(QDir.tempPath(), self.key + '.lock'))
+        self.lock.setStaleLockTime(0)
+        self.server: Optional[QLocalServer] = None
+
+    def acquire(self) -> bool:
+        return self.lock.tryLock(0)
+
+    def listen(self):
+        # сокет, оставшийся после аварийного завершения, мешает listen
+        QLocalServer.removeServer(self.key)
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self.on_connection)
+        if not self.server.listen(self.key):
+            raise OSError(self.server.errorString())
+
+    def release(self):
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+        self.lock.unlock()
+
+    def on_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            socket.readyRead.connect(lambda s=socket: self.read_message(s))
+            socket.disconnected.connect(socket.deleteLater)
+
+    def read_message(self, socket: QLocalSocket):
+        if not socket.canReadLine():
+            return
+        try:
+            paths = json.loads(bytes(socket.readLine()).decode('utf-8'))
+        except ValueError:
+            paths = None
+        socket.disconnectFromServer()
+        if isinstance(paths, list):
+            self.paths_received.emit([str(p) for p in paths])
+
+    def forward(self, paths: List[str]) -> bool:
+        """Передаёт пути работающему экземпляру; False, если он так и не ответил."""
+        message = json.dumps(paths).encode('utf-8') + b'\n'
+        for _ in range(self.FORWARD_ATTEMPTS):
+            socket = QLocalSocket()
+            socket.connectToServer(self.key)
+            if socket.waitForConnected(self.TIMEOUT_MS):
+                socket.write(message)
+                written = socket.waitForBytesWritten(self.TIMEOUT_MS)
+                socket.disconnectFromServer()
+                if socket.state() != QLocalSocket.UnconnectedState:
+                    socket.waitForDisconnected(self.TIMEOUT_MS)
+                return written
+            QThread.msleep(self.RETRY_DELAY_MS)
+        return False
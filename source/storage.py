@@ -0,0 +1,203 @@
+# *- coding: utf-8 -*-
+import sqlite3
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from source.model import KnowledgeBase, Sign, SignValue, Hypothesis, LazySign, LazyHypothesis
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS signs (
+    sign_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    question TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS hypos (
+    hypothesis_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    p REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS links (
+    hypothesis_id INTEGER NOT NULL,
+    sign_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    p_pos REAL NOT NULL,
+    p_neg REAL NOT NULL,
+    PRIMARY KEY (hypothesis_id, sign_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS links_by_sign ON links (sign_id);
+"""
+
+
+class SqliteStorage:
+    """
+    Хранилище базы знаний в SQLite (*.kb.sqlite).
+    Подписывается на изменения базы и пишет каждое из них отдельной строкой в открытую транзакцию,
+    сохранение базы - это commit, без перезаписи всего файла.
+    """
+
+    # сколько соседних строк дочитывается вместе с запрошенной ленивой
+    BLOCK_SIZE = 256
+
+    def __init__(self, path: Path):
+        self.path: Path = path
+        self.kb: Optional[KnowledgeBase] = None
+        self.lazy_signs: Dict[int, LazySign] = dict()
+        # соединение создаётся в потоке загрузки, а используется в потоке GUI; одновременно - никогда
+        self.connection = sqlite3.connect(str(path), check_same_thread=False)
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.detach()
+        self.connection.rollback()
+        self.connection.close()
+
+    def attach(self, kb: KnowledgeBase):
+        """
+        Подключает хранилище к базе. Ленивые поля, которые ещё не прочитаны, дальше читаются из этого файла,
+        даже если загружались из другого (например, до переименования файла).
+        """
+        self.detach()
+        self.kb = kb
+        kb._storage = self
+        kb.subscribe(self.on_change)
+        self.lazy_signs = {s.id: s for s in kb.signs if isinstance(s, LazySign)}
+        for s in self.lazy_signs.values():
+            s._loader = partial(self.load_sign_field, s.id)
+        for h in kb.hypos:
+            if isinstance(h, LazyHypothesis):
+                h._loader = partial(self.load_hypothesis_field, h.id)
+
+    def detach(self):
+        if self.kb is not None:
+            self.kb.unsubscribe(self.on_change)
+            self.kb._storage = None
+            self.kb = None
+
+    def load(self, lazy: bool = False) -> KnowledgeBase:
+        if lazy:
+            return self.load_lazy()
+        kb = KnowledgeBase()
+        kb.last_path = self.path
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'name'").fetchone()
+        if row:
+            kb.name = row[0]
+        kb.signs = [Sign(*row) for row in self.connection.execute(
+            "SELECT sign_id, name, question FROM signs ORDER BY sign_id")]
+        kb.hypos = [Hypothesis(*row) for row in self.connection.execute(
+            "SELECT hypothesis_id, name, description, p FROM hypos ORDER BY hypothesis_id")]
+        hypos = {h.id: h for h in kb.hypos}
+        for h_id, sign_id, p_pos, p_neg in self.connection.execute(
+                "SELECT hypothesis_id, sign_id, p_pos, p_neg FROM links ORDER BY hypothesis_id, position"):
+            hypos[h_id].signs.append(SignValue(sign_id, p_pos, p_neg))
+        self.attach(kb)
+        return kb
+
+    def load_lazy(self) -> KnowledgeBase:
+        """Читает только заголовок: id и имена признаков, id, имена и вероятности гипотез."""
+        kb = KnowledgeBase()
+        kb.last_path = self.path
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'name'").fetchone()
+        if row:
+            kb.name = row[0]
+        kb.signs = [LazySign(sign_id, name, partial(self.load_sign_field, sign_id)) for sign_id, name in
+                    self.connection.execute("SELECT sign_id, name FROM signs ORDER BY sign_id")]
+        kb.hypos = [LazyHypothesis(h_id, name, p, partial(self.load_hypothesis_field, h_id)) for h_id, name, p in
+                    self.connection.execute("SELECT hypothesis_id, name, p FROM hypos ORDER BY hypothesis_id")]
+        self.attach(kb)
+        return kb
+
+    def load_sign_field(self, sign_id: int, name: str) -> Any:
+        """Вопрос признака; заодно дочитываются вопросы следующих BLOCK_SIZE признаков."""
+        value = None
+        for row_id, question in self.connection.execute(
+                "SELECT sign_id, question FROM signs WHERE sign_id >= ? ORDER BY sign_id LIMIT ?",
+                (sign_id, self.BLOCK_SIZE)):
+            if row_id == sign_id:
+                value = question
+            else:
+                s = self.lazy_signs.get(row_id)
+                if s is not None and 'question' not in s.__dict__:
+                    s.__dict__['question'] = question
+        return value
+
+    def load_hypothesis_field(self, h_id: int, name: str) -> Any:
+        if name == 'signs':
+            return self.load_links(h_id)
+        row = self.connection.execute("SELECT description FROM hypos WHERE hypothesis_id = ?", (h_id,)).fetchone()
+        return row[0] if row else ''
+
+    def load_links(self, h_id: int) -> List[SignValue]:
+        """Связи одной гипотезы - запрос по первичному ключу, без чтения остальной базы."""
+        return [SignValue(*row) for row in self.connection.execute(
+            "SELECT sign_id, p_pos, p_neg FROM links WHERE hypothesis_id = ? ORDER BY position", (h_id,))]
+
+    def save(self, kb: KnowledgeBase):
+        if self.kb is not kb:
+            self.write_all(kb)
+            self.attach(kb)
+        self.connection.commit()
+
+    def write_all(self, kb: KnowledgeBase):
+        c = self.connection
+        c.execute("DELETE FROM links")
+        c.execute("DELETE FROM signs")
+        c.execute("DELETE FROM hypos")
+        c.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('name', ?)", (kb.name,))
+        c.executemany("INSERT INTO signs (sign_id, name, question) VALUES (?, ?, ?)",
+                      ((s.id, s.name, s.question) for s in kb.signs))
+        c.executemany("INSERT INTO hypos (hypothesis_id, name, description, p) VALUES (?, ?, ?, ?)",
+                      ((h.id, h.name, h.desc, h.init_p) for h in kb.hypos))
+        c.executemany("INSERT INTO links (hypothesis_id, sign_id, position, p_pos, p_neg) VALUES (?, ?, ?, ?, ?)",
+                      ((h.id, sv.sign_id, i, sv.p_pos, sv.p_neg) for h in kb.hypos for i, sv in enumerate(h.signs)))
+
+    def rename(self, name: str):
+        self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('name', ?)", (name,))
+
+    ###################################################################################################################
+
+    def on_change(self, event: str, *ids):
+        kb = self.kb
+        c = self.connection
+        if event == 'batch':
+            # объекты, удалённые позже в том же пакете, пропускаются: их удаление тоже есть в списке
+            for item in ids[0]:
+                self.on_change(*item)
+        elif event in ('sign_added', 'sign_changed'):
+            s = kb.get_sign_by_id(ids[0])
+            if s is None:
+                return
+            c.execute("INSERT OR REPLACE INTO signs (sign_id, name, question) VALUES (?, ?, ?)",
+                      (s.id, s.name, s.question))
+        elif event == 'sign_deleted':
+            c.execute("DELETE FROM signs WHERE sign_id = ?", ids)
+            c.execute("DELETE FROM links WHERE sign_id = ?", ids)
+        elif event in ('hypos_added', 'hypos_changed'):
+            h = kb.get_hypothesis_by_id(ids[0])
+            if h is None:
+                return
+            c.execute("INSERT OR REPLACE INTO hypos (hypothesis_id, name, description, p) VALUES (?, ?, ?, ?)",
+                      (h.id, h.name, h.desc, h.init_p))
+        elif event == 'hypos_deleted':
+            c.execute("DELETE FROM hypos WHERE hypothesis_id = ?", ids)
+            c.execute("DELETE FROM links WHERE hypothesis_id = ?", ids)
+        elif event == 'link_added':
+            sv = kb.get_link(*ids)
+            if sv is None:
+                return
+            c.execute("INSERT OR REPLACE INTO links (hypothesis_id, sign_id, position, p_pos, p_neg) "
+                      "VALUES (?, ?, (SELECT COALESCE(MAX(position), -1) + 1 FROM links WHERE hypothesis_id = ?), "
+                      "?, ?)", (ids[0], ids[1], ids[0], sv.p_pos, sv.p_neg))
+        elif event == 'link_changed':
+            sv = kb.get_link(*ids)
+            if sv is None:
+                return
+            c.execute("UPDATE links SET p_pos = ?, p_neg = ? WHERE hypothesis_id = ? AND sign_id = ?",
+                      (sv.p_pos, sv.p_neg, ids[0], ids[1]))
+        elif event == 'link_deleted':
+            c.execute("DELETE FROM links WHERE hypothesis_id = ? AND sign_id = ?", ids)
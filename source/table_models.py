@@ -0,0 +1,649 @@
+# *- coding: utf-8 -*-
+from bisect import bisect_left
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from PyQt5.QtCore import QAbstractListModel, QAbstractTableModel, QModelIndex, Qt
+
+from source.catalog import CatalogEntry
+from source.model import KnowledgeBase, Hypothesis
+
+if TYPE_CHECKING:
+    from source.engine import CompiledBase, QuestionScore
+
+READ_ONLY = Qt.ItemIsSelectable | Qt.ItemIsEnabled
+EDITABLE = READ_ONLY | Qt.ItemIsEditable
+
+
+class _BaseTableModel(QAbstractTableModel):
+    """
+    Табличная модель поверх базы знаний. Хранит только порядок строк (список id),
+    значения берёт из базы при отрисовке. Подписана на изменения базы и сообщает представлению
+    только о затронутых строках; пакет изменений (batch) сбрасывает модель целиком.
+    Строки отдаются представлению порциями по FETCH_SIZE (canFetchMore/fetchMore) по мере прокрутки.
+    Модели с SEARCH ('signs' или 'hypos') можно отфильтровать поисковым запросом (set_filter).
+    Строки - элементы списка базы ITEMS; модели связей задают строки своим load_ids.
+    Строки упорядочены по id: строку события находит двоичный поиск, так что правка одного элемента
+    не перебирает всю таблицу.
+    """
+
+    HEADERS: List[str] = list()
+    EDITABLE_COLUMNS: tuple = ()
+    FETCH_SIZE = 500
+    SEARCH: Optional[str] = None
+    ITEMS: str = 'signs'
+
+    def __init__(self, kb: KnowledgeBase, parent=None):
+        super().__init__(parent)
+        self.kb: KnowledgeBase = kb
+        self.query: str = ''
+        self.ids: List[int] = self.filtered_ids()
+        self.loaded: int = min(len(self.ids), self.FETCH_SIZE)
+        kb.subscribe(self.on_change)
+
+    def detach(self):
+        self.kb.unsubscribe(self.on_change)
+
+    def load_ids(self) -> List[int]:
+        return [item.id for item in getattr(self.kb, self.ITEMS)]
+
+    def has_item(self, item_id: int) -> bool:
+        """Относится ли элемент к строкам модели без учёта фильтра; вызывается для пришедших событий."""
+        return True
+
+    def filtered_ids(self) -> List[int]:
+        ids = self.load_ids()
+        if self.query:
+            found = getattr(self.kb.search_index, self.SEARCH).find(self.query)
+            ids = [item_id for item_id in ids if item_id in found]
+        return sorted(ids)
+
+    def find_row(self, item_id: int) -> Optional[int]:
+        row = bisect_left(self.ids, item_id)
+        return row if row < len(self.ids) and self.ids[row] == item_id else None
+
+    def set_filter(self, query: str):
+        if query.strip() != self.query:
+            self.query = query.strip()
+            self.reset()
+
+    def row_id(self, row: int) -> int:
+        return self.ids[row]
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else self.loaded
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        return not parent.isValid() and self.loaded < len(self.ids)
+
+    def fetchMore(self, parent: QModelIndex = QModelIndex()):
+        count = min(len(self.ids) - self.loaded, self.FETCH_SIZE)
+        if parent.isValid() or count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + count - 1)
+        self.loaded += count
+        self.endInsertRows()
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole) -> Any:
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlags:
+        return EDITABLE if index.column() in self.EDITABLE_COLUMNS else READ_ONLY
+
+    def reset(self):
+        self.beginResetModel()
+        self.ids = self.filtered_ids()
+        self.loaded = min(len(self.ids), self.FETCH_SIZE)
+        self.endResetModel()
+
+    def row_changed(self, item_id: int):
+        if self.query:
+            # правка могла вывести строку из фильтра или ввести в него
+            found = getattr(self.kb.search_index, self.SEARCH).matches(item_id, self.query)
+            if found != (self.find_row(item_id) is not None):
+                return self.row_inserted(item_id) if found else self.row_removed(item_id)
+        row = self.find_row(item_id)
+        if row is not None and row < self.loaded:
+            self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+
+    def row_inserted(self, item_id: int):
+        if not self.has_item(item_id):
+            return
+        if self.query and not getattr(self.kb.search_index, self.SEARCH).matches(item_id, self.query):
+            return
+        row = bisect_left(self.ids, item_id)
+        if row < len(self.ids) and self.ids[row] == item_id:
+            return
+        # строки за границей отданных представлению вставляются молча, их покажет fetchMore
+        if row > self.loaded or row == self.loaded and self.loaded < len(self.ids):
+            self.ids.insert(row, item_id)
+            return
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.ids.insert(row, item_id)
+        self.loaded += 1
+        self.endInsertRows()
+
+    def row_removed(self, item_id: int):
+        row = self.find_row(item_id)
+        if row is None:
+            return
+        if row >= self.loaded:
+            del self.ids[row]
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.ids[row]
+        self.loaded -= 1
+        self.endRemoveRows()
+
+    def on_change(self, event: str, *ids):
+        if event == 'batch':
+            self.reset()
+
+
+class SignTableModel(_BaseTableModel):
+    HEADERS = ['id', 'Признак', 'Вопрос']
+    EDITABLE_COLUMNS = (1, 2)
+    SEARCH = 'signs'
+    ITEMS = 'signs'
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        s = self.kb.get_sign_by_id(self.ids[index.row()])
+        return (str(s.id), s.name, s.question)[index.column()]
+
+    def setData(self, index: QModelIndex, value: Any, role: int = Qt.EditRole) -> bool:
+        if role != Qt.EditRole or index.column() not in self.EDITABLE_COLUMNS:
+            return False
+        s = self.kb.get_sign_by_id(self.ids[index.row()])
+        name, question = (value, s.question) if index.column() == 1 else (s.name, value)
+        self.kb.change_sign(s.id, name, question)
+        return True
+
+    def on_change(self, event: str, *ids):
+        if event == 'sign_added':
+            self.row_inserted(ids[0])
+        elif event == 'sign_changed':
+            self.row_changed(ids[0])
+        elif event == 'sign_deleted':
+            self.row_removed(ids[0])
+        else:
+            super().on_change(event, *ids)
+
+
+class HypothesisTableModel(_BaseTableModel):
+    HEADERS = ['id', 'Гипотеза', 'Вероятность', 'Описание']
+    EDITABLE_COLUMNS = (1, 2, 3)
+    SEARCH = 'hypos'
+    ITEMS = 'hypos'
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        h = self.kb.get_hypothesis_by_id(self.ids[index.row()])
+        column = index.column()
+        if column == 0:
+            return str(h.id)
+        elif column == 1:
+            return h.name
+        elif column == 2:
+            return f'{h.init_p:.3f}'
+        return h.desc
+
+    def setData(self, index: QModelIndex, value: Any, role: int = Qt.EditRole) -> bool:
+        if role != Qt.EditRole or index.column() not in self.EDITABLE_COLUMNS:
+            return False
+        h = self.kb.get_hypothesis_by_id(self.ids[index.row()])
+        fields = [h.name, f'{h.init_p:.3f}', h.desc]
+        fields[index.column() - 1] = str(value)
+        name, p, desc = fields
+        self.kb.change_hypos(h.id, name, desc, p)
+        return True
+
+    def on_change(self, event: str, *ids):
+        if event == 'hypos_added':
+            self.row_inserted(ids[0])
+        elif event == 'hypos_changed':
+            self.row_changed(ids[0])
+        elif event == 'hypos_deleted':
+            self.row_removed(ids[0])
+        else:
+            super().on_change(event, *ids)
+
+
+class SignValueTableModel(_BaseTableModel):
+    """Связи одной гипотезы с признаками: строка - признак, id строки - sign_id."""
+
+    HEADERS = ['sign_id', 'Признак', 'p+', 'p-']
+    EDITABLE_COLUMNS = (2, 3)
+
+    def __init__(self, kb: KnowledgeBase, h: Optional[Hypothesis], parent=None):
+        self.h: Optional[Hypothesis] = h
+        super().__init__(kb, parent)
+
+    def load_ids(self) -> List[int]:
+        return [sv.sign_id for sv in self.h.signs] if self.h else list()
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        sign_id = self.ids[index.row()]
+        column = index.column()
+        if column == 0:
+            return str(sign_id)
+        elif column == 1:
+            return self.kb.get_sign_by_id(sign_id).name
+        sv = self.kb.get_link(self.h.id, sign_id)
+        return str(sv.p_pos if column == 2 else sv.p_neg)
+
+    def setData(self, index: QModelIndex, value: Any, role: int = Qt.EditRole) -> bool:
+        if role != Qt.EditRole or index.column() not in self.EDITABLE_COLUMNS:
+            return False
+        sv = self.kb.get_link(self.h.id, self.ids[index.row()])
+        p_pos, p_neg = (str(value), str(sv.p_neg)) if index.column() == 2 else (str(sv.p_pos), str(value))
+        self.kb.change_link(self.h.id, sv.sign_id, p_pos, p_neg)
+        return True
+
+    def on_change(self, event: str, *ids):
+        if self.h is None:
+            return
+        if event.startswith('link_') and ids[0] != self.h.id:
+            return
+        if event == 'link_added':
+            self.row_inserted(ids[1])
+        elif event == 'link_changed':
+            self.row_changed(ids[1])
+        elif event in ('link_deleted', 'sign_deleted'):
+            self.row_removed(ids[-1])
+        elif event == 'sign_changed':
+            self.row_changed(ids[0])
+        elif event == 'hypos_deleted' and ids[0] == self.h.id:
+            self.h = None
+            self.reset()
+        else:
+            super().on_change(event, *ids)
+
+
+class OutSignListModel(_BaseTableModel):
+    """Признаки, не привязанные к гипотезе, в порядке id; для QListView (один столбец)."""
+
+    HEADERS = ['Признак']
+    SEARCH = 'signs'
+
+    def __init__(self, kb: KnowledgeBase, h: Optional[Hypothesis], parent=None):
+        self.h: Optional[Hypothesis] = h
+        super().__init__(kb, parent)
+
+    def set_hypothesis(self, h: Hypothesis):
+        self.h = h
+        self.reset()
+
+    def load_ids(self) -> List[int]:
+        return [s.id for s in self.kb.get_signs_out_hypothesis(self.h)] if self.h else list()
+
+    def has_item(self, item_id: int) -> bool:
+        return self.h is not None and self.kb.get_link(self.h.id, item_id) is None
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if role != Qt.DisplayRole:
+            return None
+        return self.kb.get_sign_by_id(self.ids[index.row()]).name
+
+    def on_change(self, event: str, *ids):
+        if self.h is None:
+            return
+        if event.startswith('link_') and ids[0] != self.h.id:
+            return
+        if event == 'link_added':
+            self.row_removed(ids[1])
+        elif event == 'link_deleted':
+            self.row_inserted(ids[1])
+        elif event == 'sign_added':
+            self.row_inserted(ids[0])
+        elif event == 'sign_changed':
+            self.row_changed(ids[0])
+        elif event == 'sign_deleted':
+            self.row_removed(ids[0])
+        elif event == 'hypos_deleted' and ids[0] == self.h.id:
+            self.h = None
+            self.reset()
+        else:
+            super().on_change(event, *ids)
+
+
+def parse_probability(text: str) -> float:
+    """Вероятность из текста ячейки: допускается запятая; ValueError, если не число или вне [0; 1]."""
+    try:
+        value = float(text.strip().replace(',', '.'))
+    except ValueError:
+        raise ValueError(f'"{text.strip()}" - не число') from None
+    if not 0 <= value <= 1:
+        raise ValueError(f'{text.strip()} вне [0; 1]')
+    return value
+
+
+class LinkMatrixModel(QAbstractTableModel):
+    """
+    Матрица связей всей базы: строка - признак, на каждую гипотезу два столбца, p+ и p-.
+    Модель разреженная: хранит только порядок признаков и гипотез, значение ячейки берёт из индекса связей,
+    пустая ячейка - признак не привязан к гипотезе. Ввод значения в пустую ячейку создаёт связь,
+    пустое значение удаляет её.
+    """
+
+    FIELDS = ('p+', 'p-')
+
+    def __init__(self, kb: KnowledgeBase, parent=None):
+        super().__init__(parent)
+        self.kb: KnowledgeBase = kb
+        self.sign_ids: List[int] = list()
+        self.hypo_ids: List[int] = list()
+        self.rows: Dict[int, int] = dict()
+        self.columns: Dict[int, int] = dict()
+        self.load()
+        kb.subscribe(self.on_change)
+
+    def detach(self):
+        self.kb.unsubscribe(self.on_change)
+
+    def load(self):
+        self.sign_ids = [s.id for s in self.kb.signs]
+        self.hypo_ids = [h.id for h in self.kb.hypos]
+        self.rows = {sign_id: row for row, sign_id in enumerate(self.sign_ids)}
+        self.columns = {h_id: column for column, h_id in enumerate(self.hypo_ids)}
+
+    def reset(self):
+        self.beginResetModel()
+        self.load()
+        self.endResetModel()
+
+    def cell(self, row: int, column: int) -> Tuple[int, int, int]:
+        """(h_id, sign_id, поле): поле 0 - p+, 1 - p-."""
+        return self.hypo_ids[column // 2], self.sign_ids[row], column % 2
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.sign_ids)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else 2 * len(self.hypo_ids)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole) -> Any:
+        if orientation == Qt.Horizontal:
+            h = self.kb.get_hypothesis_by_id(self.hypo_ids[section // 2])
+            if role == Qt.DisplayRole:
+                return f'{h.name}\n{self.FIELDS[section % 2]}'
+            elif role == Qt.ToolTipRole:
+                return h.desc or h.name
+        else:
+            s = self.kb.get_sign_by_id(self.sign_ids[section])
+            if role == Qt.DisplayRole:
+                return s.name
+            elif role == Qt.ToolTipRole:
+                return s.question or s.name
+        return None
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlags:
+        return EDITABLE
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        h_id, sign_id, field = self.cell(index.row(), index.column())
+        sv = self.kb.get_link(h_id, sign_id)
+        if sv is None:
+            return ''
+        return str(sv.p_neg if field else sv.p_pos)
+
+    def setData(self, index: QModelIndex, value: Any, role: int = Qt.EditRole) -> bool:
+        if role != Qt.EditRole:
+            return False
+        try:
+            self.set_value(index.row(), index.column(), str(value))
+        except ValueError:
+            return False
+        return True
+
+    def set_value(self, row: int, column: int, text: str):
+        h_id, sign_id, field = self.cell(row, column)
+        sv = self.kb.get_link(h_id, sign_id)
+        if not text.strip():
+            if sv is not None:
+                self.kb.delete_link(h_id, sign_id)
+            return
+        value = parse_probability(text)
+        if sv is None:
+            sv = self.kb.add_link(h_id, sign_id)
+        p_pos, p_neg = (sv.p_pos, value) if field else (value, sv.p_neg)
+        self.kb.change_link(h_id, sign_id, str(p_pos), str(p_neg))
+
+    def set_values(self, cells: List[Tuple[int, int, str]]):
+        """
+        Записывает ячейки (строка, столбец, текст) одним пакетом изменений базы:
+        при первом же неверном значении ничего не меняется, ValueError называет ячейку.
+        """
+        with self.kb.batch():
+            for row, column, text in cells:
+                try:
+                    self.set_value(row, column, text)
+                except ValueError as error:
+                    h_id, sign_id, field = self.cell(row, column)
+                    raise ValueError(f'{self.kb.get_sign_by_id(sign_id).name} / '
+                                     f'{self.kb.get_hypothesis_by_id(h_id).name} {self.FIELDS[field]}: '
+                                     f'{error}') from error
+
+    def insert_line(self, orientation: Qt.Orientation, item_id: int):
+        if orientation == Qt.Vertical:
+            position = [s.id for s in self.kb.signs].index(item_id)
+            self.beginInsertRows(QModelIndex(), position, position)
+            self.load()
+            self.endInsertRows()
+        else:
+            position = [h.id for h in self.kb.hypos].index(item_id)
+            self.beginInsertColumns(QModelIndex(), 2 * position, 2 * position + 1)
+            self.load()
+            self.endInsertColumns()
+
+    def remove_line(self, orientation: Qt.Orientation, item_id: int):
+        if orientation == Qt.Vertical:
+            if item_id not in self.rows:
+                return
+            row = self.rows[item_id]
+            self.beginRemoveRows(QModelIndex(), row, row)
+            self.load()
+            self.endRemoveRows()
+        else:
+            if item_id not in self.columns:
+                return
+            column = 2 * self.columns[item_id]
+            self.beginRemoveColumns(QModelIndex(), column, column + 1)
+            self.load()
+            self.endRemoveColumns()
+
+    def on_change(self, event: str, *ids):
+        if event.startswith('link_'):
+            h_id, sign_id = ids
+            if h_id in self.columns and sign_id in self.rows:
+                row, column = self.rows[sign_id], 2 * self.columns[h_id]
+                self.dataChanged.emit(self.index(row, column), self.index(row, column + 1))
+        elif event == 'sign_added':
+            self.insert_line(Qt.Vertical, ids[0])
+        elif event == 'sign_deleted':
+            self.remove_line(Qt.Vertical, ids[0])
+        elif event == 'sign_changed' and ids[0] in self.rows:
+            self.headerDataChanged.emit(Qt.Vertical, self.rows[ids[0]], self.rows[ids[0]])
+        elif event == 'hypos_added':
+            self.insert_line(Qt.Horizontal, ids[0])
+        elif event == 'hypos_deleted':
+            self.remove_line(Qt.Horizontal, ids[0])
+        elif event == 'hypos_changed' and ids[0] in self.columns:
+            column = 2 * self.columns[ids[0]]
+            self.headerDataChanged.emit(Qt.Horizontal, column, column + 1)
+        elif event == 'batch':
+            self.batch_changed(ids[0])
+
+    def batch_changed(self, events: List[tuple]):
+        """Пакет только из правок связей (вставка, заполнение) обновляет охватывающий их блок ячеек без сброса."""
+        if any(not e[0].startswith('link_') for e in events):
+            return self.reset()
+        rows = [self.rows[e[2]] for e in events if e[2] in self.rows]
+        columns = [2 * self.columns[e[1]] for e in events if e[1] in self.columns]
+        if rows and columns:
+            self.dataChanged.emit(self.index(min(rows), min(columns)), self.index(max(rows), max(columns) + 1))
+
+
+class BaseStateTableModel(QAbstractTableModel):
+    """Состояние расчёта: текущие P, P min, P max гипотез. Только для чтения."""
+
+    HEADERS = ['P', 'P min', 'P max', 'Гипотеза']
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.hypos: List[Hypothesis] = list()
+
+    def fill(self, hypos: List[Hypothesis]):
+        """Новый список гипотез сбрасывает модель, тот же самый - обновляет значения на месте."""
+        if hypos is not self.hypos or len(hypos) != self.rowCount():
+            self.beginResetModel()
+            self.hypos = hypos
+            self.endResetModel()
+        elif hypos:
+            self.dataChanged.emit(self.index(0, 0), self.index(len(hypos) - 1, len(self.HEADERS) - 1))
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.hypos)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole) -> Any:
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlags:
+        return READ_ONLY
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if role != Qt.DisplayRole:
+            return None
+        h = self.hypos[index.row()]
+        return (f'{h.init_p:.3f}', f'{h.p_min:.3f}', f'{h.p_max:.3f}', h.name)[index.column()]
+
+
+class QuestionScoreTableModel(QAbstractTableModel):
+    """Лучшие следующие вопросы расчёта: ЦС, ожидаемая информация и текст вопроса. Только для чтения."""
+
+    HEADERS = ['ЦС', 'Информация', 'Вопрос']
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.base: Optional['CompiledBase'] = None
+        self.scores: List['QuestionScore'] = list()
+
+    def fill(self, base: 'CompiledBase', scores: List['QuestionScore']):
+        self.beginResetModel()
+        self.base = base
+        self.scores = scores
+        self.endResetModel()
+
+    def sign_id(self, row: int) -> int:
+        return self.base.sign_ids[self.scores[row].sign]
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.scores)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole) -> Any:
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlags:
+        return READ_ONLY
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if role != Qt.DisplayRole:
+            return None
+        score = self.scores[index.row()]
+        return (f'{score.attest:.3f}', f'{score.information:.3f}', self.base.questions[score.sign])[index.column()]
+
+
+class FileListModel(QAbstractListModel):
+    """
+    Список файлов баз знаний: имя, путь (Qt.UserRole) и подсказка из каталога.
+    Строки отдаются представлению порциями по FETCH_SIZE, как и в табличных моделях базы.
+    """
+
+    FETCH_SIZE = 500
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.entries: List[Tuple[Path, Optional[CatalogEntry]]] = list()
+        self.loaded: int = 0
+
+    def set_entries(self, entries: List[Tuple[Path, Optional[CatalogEntry]]]):
+        self.beginResetModel()
+        self.entries = entries
+        self.loaded = min(len(entries), self.FETCH_SIZE)
+        self.endResetModel()
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else self.loaded
+
+    def canFetchMore(self, parent: QModelIndex = QModelIndex()) -> bool:
+        return not parent.isValid() and self.loaded < len(self.entries)
+
+    def fetchMore(self, parent: QModelIndex = QModelIndex()):
+        count = min(len(self.entries) - self.loaded, self.FETCH_SIZE)
+        if parent.isValid() or count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + count - 1)
+        self.loaded += count
+        self.endInsertRows()
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        path, entry = self.entries[index.row()]
+        if role == Qt.DisplayRole:
+            return path.name.split('.')[0]
+        elif role == Qt.UserRole:
+            return str(path)
+        elif role == Qt.ToolTipRole and entry is not None:
+            return f'{entry.name}\nПризнаков: {entry.signs}, гипотез: {entry.hypos}\n{entry.size / 1024:.1f} КБ'
+        return None
+
+    def find(self, path: Path) -> int:
+        for row, (p, _) in enumerate(self.entries):
+            if p == path:
+                return row
+        return -1
+
+    def apply_event(self, event: str, old_path: Path, path: Path, entry: Optional[CatalogEntry]):
+        """Обновляет одну строку по событию DirectoryWatcher (added/removed/changed/renamed)."""
+        row = self.find(old_path)
+        if event == 'removed':
+            if row < 0:
+                return
+            if row >= self.loaded:
+                del self.entries[row]
+                return
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.entries[row]
+            self.loaded -= 1
+            self.endRemoveRows()
+        elif row >= 0:
+            self.entries[row] = (path, entry)
+            if row < self.loaded:
+                self.dataChanged.emit(self.index(row), self.index(row))
+        elif self.loaded < len(self.entries):
+            self.entries.append((path, entry))
+        else:
+            self.beginInsertRows(QModelIndex(), self.loaded, self.loaded)
+            self.entries.append((path, entry))
+            self.loaded += 1
+            self.endInsertRows()
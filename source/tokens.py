@@ -0,0 +1,140 @@
+# *- coding: utf-8 -*-
+import base64
+import hashlib
+import hmac
+import struct
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from source.engine import CompiledBase, Consultation, StateCache
+from source.model import ANSWER_WEIGHTS
+
+# версия, флаги, начало отпечатка базы (CompiledBase.key), время выдачи
+_HEADER = struct.Struct('<BB8sI')
+_VERSION = 1
+_POSTERIOR = 1
+_STOP = 2
+
+
+class TokenError(ValueError):
+    pass
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        if offset >= len(data):
+            raise TokenError('Токен обрезан')
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+class SessionTokens:
+    """
+    Весь сеанс расчёта в подписанном токене, который хранит клиент: отпечаток базы, время выдачи и пары
+    (признак, ответ), по varint на пару. Любой процесс с тем же секретом и той же скомпилированной базой
+    восстанавливает сеанс повтором ответов - общее хранилище и привязка клиента к процессу не нужны.
+    С posterior=True в токен пишутся ещё текущий вопрос, P, P min и P max: токен длиннее,
+    зато восстановление не зависит от числа ответов.
+    Подпись - HMAC-SHA256, усечённый до SIGNATURE_SIZE байт; токен - base64url без '='.
+    Повтор проверяет, что каждый ответ дан на вопрос, который задал бы расчёт; с cache состояние после
+    каждого шага берётся из StateCache.
+    """
+
+    SIGNATURE_SIZE = 16
+
+    def __init__(self, secret: bytes, bases: List[CompiledBase], ttl: float = 24 * 3600, posterior: bool = False,
+                 cache: Optional[StateCache] = None):
+        self.secret: bytes = secret
+        self.bases: Dict[bytes, CompiledBase] = {base.key: base for base in bases}
+        self.ttl: float = ttl
+        self.posterior: bool = posterior
+        self.cache: Optional[StateCache] = cache
+
+    def sign(self, payload: bytes) -> bytes:
+        return hmac.new(self.secret, payload, hashlib.sha256).digest()[:self.SIGNATURE_SIZE]
+
+    def encode(self, session: Consultation) -> str:
+        flags = (_POSTERIOR if self.posterior else 0) | (_STOP if session.stop else 0)
+        payload = bytearray(_HEADER.pack(_VERSION, flags, session.base.key, int(time.time())))
+        _write_varint(payload, len(session.answers))
+        for question, answer in session.answers:
+            _write_varint(payload, question * len(ANSWER_WEIGHTS) + answer)
+        if self.posterior:
+            _write_varint(payload, session.current)
+            vectors = (*session.p, *session.p_min, *session.p_max)
+            payload += struct.pack(f'<{len(vectors)}d', *vectors)
+        payload += self.sign(payload)
+        return base64.urlsafe_b64encode(payload).rstrip(b'=').decode('ascii')
+
+    def decode(self, token: str) -> Consultation:
+        """Сеанс из токена; TokenError, если подпись неверна, токен просрочен или базы нет среди загруженных."""
+        try:
+            data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        except ValueError:
+            raise TokenError('Токен не в base64url')
+        payload, signature = data[:-self.SIGNATURE_SIZE], data[-self.SIGNATURE_SIZE:]
+        if len(payload) < _HEADER.size or not hmac.compare_digest(signature, self.sign(payload)):
+            raise TokenError('Неверная подпись токена')
+        version, flags, key, issued = _HEADER.unpack_from(payload)
+        if version != _VERSION:
+            raise TokenError(f'Неизвестная версия токена {version}')
+        if issued < time.time() - self.ttl:
+            raise TokenError('Токен просрочен')
+        base = self.bases.get(key)
+        if base is None:
+            raise TokenError('База токена не загружена')
+
+        count, offset = _read_varint(payload, _HEADER.size)
+        answers = list()
+        for _ in range(count):
+            value, offset = _read_varint(payload, offset)
+            answers.append(divmod(value, len(ANSWER_WEIGHTS)))
+        if any(question >= len(base.sign_ids) for question, _ in answers):
+            raise TokenError('Токен не подходит к базе')
+
+        if not flags & _POSTERIOR:
+            # каждый ответ должен быть дан на вопрос, который задал бы расчёт; с cache шаги берутся из него
+            try:
+                session = Consultation(base, self.cache)
+            except ValueError as error:
+                raise TokenError(f'Ответы токена не подходят к базе: {error}')
+            for question, answer in answers:
+                if session.stop or session.current != question:
+                    raise TokenError('Ответы токена не совпадают с расчётом по базе')
+                session.answer(answer)
+            return session
+
+        current, offset = _read_varint(payload, offset)
+        hypos = len(base.hypo_ids)
+        if current >= len(base.sign_ids) or len(payload) - offset != 3 * 8 * hypos:
+            raise TokenError('Токен не подходит к базе')
+        vectors = struct.unpack_from(f'<{3 * hypos}d', payload, offset)
+        session = Consultation.__new__(Consultation)
+        session.base = base
+        session.p = array('d', vectors[:hypos])
+        session.p_min = array('d', vectors[hypos:2 * hypos])
+        session.p_max = array('d', vectors[2 * hypos:])
+        session.answered = bytearray(len(base.sign_ids))
+        for question, _ in answers:
+            session.answered[question] = 1
+        session.answers = answers
+        session.current = current
+        session.stop = bool(flags & _STOP)
+        session.cache = self.cache
+        session.path = base.key
+        for question, answer in answers:
+            session.path = StateCache.chain(session.path, question, answer)
+        return session
@@ -0,0 +1,192 @@
+# *- coding: utf-8 -*-
+import os
+import select
+import struct
+import sys
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional, Sequence, Set, Tuple
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def _load_inotify():
+    if not sys.platform.startswith('linux'):
+        return None
+    # ctypes.util.find_library запускает внешние процессы и заметно удлиняет запуск;
+    # функции libc и так доступны в самом процессе Python
+    import ctypes
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class DirectoryWatcher:
+    """
+    Следит за каталогом баз в фоновом потоке и сообщает об изменениях:
+    callback(event, name, new_name), где event - added/removed/changed/renamed,
+    new_name заполнено только для renamed. Учитываются только файлы с указанными суффиксами.
+    На Linux используется inotify, на остальных системах - опрос каталога раз в interval секунд.
+    callback вызывается из фонового потока.
+    """
+
+    def __init__(self, directory: Path, suffixes: Sequence[str], callback: Callable[[str, str, str], None],
+                 interval: float = 1.0):
+        self.directory: Path = directory
+        self.suffixes: Tuple[str, ...] = tuple(suffixes)
+        self.callback = callback
+        self.interval: float = interval
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+        self.libc = _load_inotify()
+        self.created: Set[str] = set()
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self.libc is not None
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.stop_event.clear()
+        fd = self._inotify_fd() if self.libc is not None else None
+        if fd is None:
+            self.libc = None
+            target, args = self._run_polling, ()
+        else:
+            target, args = self._run_inotify, (fd,)
+        self.thread = threading.Thread(target=target, args=args, name='kb-watcher', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def _is_base(self, name: str) -> bool:
+        return name.endswith(self.suffixes)
+
+    def _emit(self, event: str, name: str, new_name: str = ''):
+        self.callback(event, name, new_name)
+
+    ###################################################################################################################
+
+    def _inotify_fd(self) -> Optional[int]:
+        fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return None
+        mask = IN_CREATE | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+        if self.libc.inotify_add_watch(fd, os.fsencode(str(self.directory)), mask) < 0:
+            os.close(fd)
+            return None
+        return fd
+
+    def _run_inotify(self, fd: int):
+        try:
+            while not self.stop_event.is_set():
+                ready, _, _ = select.select([fd], [], [], self.interval)
+                if not ready:
+                    continue
+                try:
+                    data = os.read(fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                if self._dispatch_inotify(data):
+                    return
+        finally:
+            os.close(fd)
+
+    def _dispatch_inotify(self, data: bytes) -> bool:
+        """Разбирает пачку событий inotify; возвращает True, если каталог удалён или перемещён."""
+        moved_from: Dict[int, str] = dict()
+        offset = 0
+        while offset < len(data):
+            _, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                return True
+            if mask & IN_MOVED_FROM:
+                moved_from[cookie] = name
+            elif mask & IN_MOVED_TO:
+                old_name = moved_from.pop(cookie, None)
+                if old_name is not None and self._is_base(old_name) and self._is_base(name):
+                    self._emit('renamed', old_name, name)
+                elif old_name is not None and self._is_base(old_name):
+                    self._emit('removed', old_name)
+                elif self._is_base(name):
+                    self._emit('added', name)
+            elif not self._is_base(name):
+                continue
+            elif mask & IN_CREATE:
+                # о новом файле сообщаем, когда он будет дописан
+                self.created.add(name)
+            elif mask & IN_CLOSE_WRITE:
+                if name in self.created:
+                    self.created.discard(name)
+                    self._emit('added', name)
+                else:
+                    self._emit('changed', name)
+            elif mask & IN_DELETE:
+                if name in self.created:
+                    self.created.discard(name)
+                else:
+                    self._emit('removed', name)
+        for name in moved_from.values():
+            if self._is_base(name):
+                self._emit('removed', name)
+        return False
+
+    ###################################################################################################################
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = dict()
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if self._is_base(entry.name):
+                    stat = entry.stat()
+                    snapshot[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def _run_polling(self):
+        """Запасной вариант: раз в interval секунд сравнивает снимок каталога с предыдущим."""
+        try:
+            known = self._snapshot()
+        except OSError:
+            return
+        while not self.stop_event.wait(self.interval):
+            try:
+                current = self._snapshot()
+            except OSError:
+                return
+            removed = {n: v for n, v in known.items() if n not in current}
+            for name, value in current.items():
+                if name not in known:
+                    old_name = next((n for n, v in removed.items() if v == value), None)
+                    if old_name is not None:
+                        del removed[old_name]
+                        self._emit('renamed', old_name, name)
+                    else:
+                        self._emit('added', name)
+                elif known[name] != value:
+                    self._emit('changed', name)
+            for name in removed:
+                self._emit('removed', name)
+            known = current